@@ -1,3 +1,5 @@
+import asyncio
+import contextlib
 import os
 
 from telegram.ext import (
@@ -9,6 +11,7 @@ from telegram.ext import (
 )
 
 from donquijote.conversations.cancel import cancel
+from donquijote.conversations.helpers import log_rate_limiter_stats
 from donquijote.conversations.init import (
     AGREE,
     HOW_OFTEN,
@@ -34,32 +37,139 @@ from donquijote.conversations.play import counts, play, vocab
 from donquijote.conversations.settings import (
     CHANGE_MAX_VOCABS,
     CHANGE_NAME,
+    CHANGE_TIMEZONE,
     CHANGE_WORDS,
     SETTINGS_ROUTER,
     change_max_vocabs,
     change_name,
+    change_timezone,
     change_words,
     settings,
     settings_router,
 )
+from donquijote.db.migrate import migrate
+from donquijote.db.mongodb import (
+    Vocabulary,
+    check_query_plans,
+    ensure_indexes,
+)
 
+BOT_MODE = os.environ.get("BOT_MODE", "polling")
+CONCURRENT_UPDATES = int(os.environ.get("BOT_CONCURRENT_UPDATES", 32))
+RATE_STATS_INTERVAL = int(os.environ.get("TELEGRAM_STATS_INTERVAL", 300))
+WEBHOOK_OPTIONS = {
+    "listen": os.environ.get("WEBHOOK_LISTEN", "0.0.0.0"),
+    "port": int(os.environ.get("WEBHOOK_PORT", 8080)),
+    "url_path": os.environ.get("WEBHOOK_PATH", "telegram"),
+    "webhook_url": os.environ.get("WEBHOOK_URL"),
+    "secret_token": os.environ.get("WEBHOOK_SECRET"),
+}
 
-def main() -> None:
-    """Main entrypoint of the conversation bot.
+
+class ChatOrderedApplication(Application):
+    """An application that processes updates of different chats concurrently, up to the
+    concurrency limit, but the updates of a chat one after the other and in order, so
+    the conversation state of a chat never sees two updates at once.
+
+    An update waits for the previous updates of its chat before it takes one of the
+    concurrent update slots, so the queued updates of a busy chat can't starve the
+    other chats.
+
+    Methods:
+        process_update(self, update): Processes an update after the previous updates of
+            its chat.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._chat_locks = {}
+        # Application takes a slot before it calls process_update, which would hold it
+        # while the update waits for its chat. The slots are taken in process_update.
+        self._update_slots = self._concurrent_updates_sem
+        self._concurrent_updates_sem = contextlib.nullcontext()
+
+    async def process_update(self, update: object) -> None:
+        """Processes an update after the previous updates of its chat. Updates without a
+        chat are processed right away.
+
+        Args:
+            update (object): The update to process
+
+        Returns:
+            None
+        """
+        chat = getattr(update, "effective_chat", None)
+        if chat is None:
+            async with self._update_slots:
+                return await super().process_update(update)
+
+        lock, waiting = self._chat_locks.get(chat.id, (asyncio.Lock(), 0))
+        self._chat_locks[chat.id] = (lock, waiting + 1)
+        try:
+            async with lock, self._update_slots:
+                await super().process_update(update)
+        finally:
+            lock, waiting = self._chat_locks[chat.id]
+            if waiting == 1:
+                del self._chat_locks[chat.id]
+            else:
+                self._chat_locks[chat.id] = (lock, waiting - 1)
+
+
+def check_webhook_options(options=None):
+    """Checks that the webhook can be registered and its requests authenticated.
 
     Args:
+        options (dict, optional): The keyword arguments of run_webhook, defaults to
+            WEBHOOK_OPTIONS
+
+    Returns:
         None
 
+    Raises:
+        ValueError: If WEBHOOK_URL or WEBHOOK_SECRET is not set.
+    """
+    options = WEBHOOK_OPTIONS if options is None else options
+    missing = [
+        name
+        for name, key in [
+            ("WEBHOOK_URL", "webhook_url"),
+            ("WEBHOOK_SECRET", "secret_token"),
+        ]
+        if not options.get(key)
+    ]
+    if missing:
+        raise ValueError(
+            f"BOT_MODE=webhook requires {' and '.join(missing)} to be set"
+        )
+
+
+def build_application(
+    token=None, base_url=None, concurrent_updates=CONCURRENT_UPDATES
+):
+    """Builds the application with all conversation handlers. The queue depth and the
+    wait times of the rate limiter are logged every TELEGRAM_STATS_INTERVAL seconds.
+
+    Args:
+        token (str, optional): The bot token, defaults to the BOT_TOKEN environment variable
+        base_url (str, optional): The base URL of the Bot API, e.g. of a local Bot API
+            server, defaults to the Telegram servers
+        concurrent_updates (int, optional): The number of updates processed concurrently
+
     Returns:
-        None. Runs the python-telegram-bot application.
+        telegram.ext.Application: The application, not yet initialized.
     """
-    application = (
+    builder = (
         Application.builder()
-        .token(os.environ["BOT_TOKEN"])
+        .application_class(ChatOrderedApplication)
+        .token(token or os.environ["BOT_TOKEN"])
         .read_timeout(30)
         .write_timeout(30)
-        .build()
+        .concurrent_updates(concurrent_updates)
     )
+    if base_url is not None:
+        builder = builder.base_url(base_url)
+    application = builder.build()
 
     init_handler = ConversationHandler(
         entry_points=[CommandHandler("start", start)],
@@ -143,6 +253,11 @@ def main() -> None:
                     filters.TEXT & (~filters.COMMAND), change_max_vocabs
                 )
             ],
+            CHANGE_TIMEZONE: [
+                MessageHandler(
+                    filters.TEXT & (~filters.COMMAND), change_timezone
+                )
+            ],
         },
         fallbacks=[CommandHandler("cancel", cancel)],
     )
@@ -152,7 +267,42 @@ def main() -> None:
     application.add_handler(init_handler)
     application.add_handler(settings_handler)
 
-    application.run_polling(timeout=120)
+    application.job_queue.run_repeating(
+        log_rate_limiter_stats,
+        interval=RATE_STATS_INTERVAL,
+        first=RATE_STATS_INTERVAL,
+    )
+
+    return application
+
+
+def main() -> None:
+    """Main entrypoint of the conversation bot. With BOT_MODE=webhook, the updates are
+    pushed by Telegram to a local HTTP listener configured by the WEBHOOK_* environment
+    variables, otherwise they are fetched by long polling. The webhook mode fails at
+    startup unless WEBHOOK_URL and WEBHOOK_SECRET are set. Up to BOT_CONCURRENT_UPDATES
+    updates are processed concurrently in both modes.
+
+    Args:
+        None
+
+    Returns:
+        None. Runs the python-telegram-bot application.
+    """
+    if BOT_MODE == "webhook":
+        check_webhook_options()
+
+    ensure_indexes()
+    migrate()
+    check_query_plans()
+    Vocabulary().reload()
+
+    application = build_application()
+
+    if BOT_MODE == "webhook":
+        application.run_webhook(**WEBHOOK_OPTIONS)
+    else:
+        application.run_polling(timeout=120)
 
 
 if __name__ == "__main__":
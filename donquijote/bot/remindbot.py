@@ -1,16 +1,227 @@
 import asyncio
+import logging
 import os
+import socket
 from datetime import datetime as dt
+from datetime import timedelta as td
 
 import pytz
 from telegram import Bot
 
-from donquijote.conversations.helpers import send
-from donquijote.db.mongodb import User
+from donquijote.bot.scheduler import Fanout, next_tick
+from donquijote.db.asyncmongodb import (
+    AsyncReminderJournal,
+    AsyncSRS,
+    AsyncUser,
+)
+from donquijote.db.migrate import migrate
+from donquijote.db.mongodb import check_query_plans, ensure_indexes
+from donquijote.util.timezone import day_ordinal, day_start, timezone
 
-u = User()
-bot = Bot(token=os.environ["BOT_TOKEN"])
-loop = asyncio.get_event_loop()
+logger = logging.getLogger(__name__)
+
+# The reminder bot's share of the bot token's bulk limit, see RATE_LIMITER in
+# conversations.helpers for the conversation bot's share.
+FANOUT_OPTIONS = {
+    "workers": int(os.environ.get("REMINDER_WORKERS", 16)),
+    "rate": float(os.environ.get("REMINDER_RATE", 10)),
+    "chat_interval": float(os.environ.get("REMINDER_CHAT_INTERVAL", 1)),
+}
+REBUCKET_EVERY = int(os.environ.get("REMINDER_REBUCKET_EVERY", 15))
+LEASE = int(os.environ.get("REMINDER_LEASE", 900))
+CATCH_UP = td(minutes=int(os.environ.get("REMINDER_CATCH_UP", 60)))
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+user = AsyncUser()
+srs = AsyncSRS()
+journal = AsyncReminderJournal()
+
+
+def message(name, due=0):
+    """Returns the reminder text for a user.
+
+    Args:
+        name (str): The name of the user
+        due (int, optional): The number of words the user has to repeat today
+
+    Returns:
+        str: The reminder text.
+    """
+    if due:
+        return f"Hola {name}! Tienes {due} palabras para repasar hoy. Escribe /play y podemos empezar."
+
+    return f"Hola {name}! Es hora de aprender tu vocabulario. Escribe /play y podemos empezar."
+
+
+async def enrich(reminders):
+    """Drops the reminders of users who already practised on their local day and counts the
+    words every remaining user has to repeat today. Whether a user practised is read from
+    the 'last_practice_day' returned with the due users, and the due words of all users are
+    counted with a single aggregation, grouped by the local midnight of their timezone.
+
+    Args:
+        reminders (List[Tuple[Dict, datetime]]): The due user documents, see User.due_at,
+            with the minute in UTC they are due in
+
+    Returns:
+        List[Tuple[Dict, datetime, int]]: The reminders to send with the number of due words.
+    """
+    pending, groups = [], {}
+    for u, tick in reminders:
+        now = tick.replace(tzinfo=None)
+        if u.get("last_practice_day") == day_ordinal(u.get("tz"), now):
+            continue
+        pending.append((u, tick))
+        groups.setdefault(day_start(u.get("tz"), now), []).append(u["user_id"])
+
+    due = await srs.due_counts(
+        [(user_ids, cutoff) for cutoff, user_ids in groups.items()]
+    )
+
+    return [(u, tick, due.get(u["user_id"], 0)) for u, tick in pending]
+
+
+def submit(fanout, claims, keys):
+    """Submits claimed reminders to the fan-out, one submission per tick.
+
+    Args:
+        fanout (Fanout): The fan-out to deliver the reminders with
+        claims (List[Dict]): The claimed reminders, see ReminderJournal.claim
+        keys (Dict[Tuple[datetime, int], str]): Collects the journal key of every submitted
+            reminder by tick and chat ID
+
+    Returns:
+        None
+    """
+    ticks = {}
+    for claim in claims:
+        tick = claim["tick"]
+        if tick.tzinfo is None:
+            tick = pytz.utc.localize(tick)
+        keys[(tick, claim["user_id"])] = claim["_id"]
+        ticks.setdefault(tick, []).append(
+            (claim["user_id"], message(claim["name"], claim.get("due", 0)))
+        )
+
+    for tick, messages in sorted(ticks.items()):
+        fanout.submit(tick, messages)
+
+
+async def process(fanout, ticks, keys):
+    """Claims and submits the reminders due in one or more minutes. All minutes are
+    looked up with a single query on the precomputed UTC minutes of the reminders and
+    enriched in one batch, see enrich. Only the reminders this process could claim in
+    the journal are sent, so no reminder is sent twice, even by several replicas. The
+    journal key holds the local date and time of the reminder in the timezone of the user.
+
+    Args:
+        fanout (Fanout): The fan-out to deliver the reminders with
+        ticks (List[datetime]): The minutes in UTC
+        keys (Dict[Tuple[datetime, int], str]): Collects the journal keys, see submit
+
+    Returns:
+        None
+    """
+    minutes = {tick.hour * 60 + tick.minute: tick for tick in ticks}
+
+    reminders = await enrich(
+        [
+            (u, minutes[m])
+            for u in await user.due_at(list(minutes))
+            for m in set(u["reminder_utc"]) & minutes.keys()
+        ]
+    )
+
+    claims = [
+        {
+            "_id": journal.key(
+                u["user_id"], tick.astimezone(timezone(u.get("tz")))
+            ),
+            "user_id": u["user_id"],
+            "name": u["name"],
+            "tick": tick,
+            "due": due,
+        }
+        for u, tick, due in reminders
+    ]
+
+    submit(fanout, await journal.claim(claims, OWNER, LEASE), keys)
+    await journal.advance(max(ticks))
+
+
+async def remind(bot):
+    """Sleeps until the start of each minute and submits the reminders due in that minute
+    to a rate-limited fan-out. Each tick only fetches the users that are due from the
+    multikey index on the reminders, so a tick costs O(users due), not O(all users).
+    Ticks are processed one after the other and never wait for the delivery, so a
+    large tick delays neither the following minutes nor their reminders' submission.
+
+    Reminders are bucketed by their minute of the UTC day. Every REMINDER_REBUCKET_EVERY
+    minutes, the users of timezones whose UTC offset changed, e.g. at a DST transition,
+    are moved to their new buckets in one batch.
+
+    Every reminder goes through the delivery journal. On startup, the minutes missed
+    since the last processed minute are caught up in one batch, up to REMINDER_CATCH_UP
+    minutes back. Reminders claimed by a process that died before sending them are
+    reclaimed once their lease runs out.
+
+    Args:
+        bot (telegram._bot.Bot): The bot to send the reminders with
+
+    Returns:
+        None. Runs forever.
+    """
+
+    async def send(chat_id, text):
+        await bot.send_message(
+            chat_id=chat_id, text=text, read_timeout=30, write_timeout=30
+        )
+
+    keys = {}
+
+    async def on_result(tick, chat_id, sent):
+        key = keys.pop((tick, chat_id), None)
+        if key is None:
+            return
+        if sent:
+            await journal.sent(key)
+        else:
+            await journal.failed(key)
+
+    fanout = Fanout(send, on_result=on_result, **FANOUT_OPTIONS)
+    async with bot:
+        fanout.start()
+
+        tick = next_tick(dt.now(pytz.utc))
+        await user.rebucket(tick.replace(tzinfo=None))
+        last = await journal.last_tick()
+        if last is not None:
+            missed = max(
+                pytz.utc.localize(last) + td(minutes=1),
+                tick - CATCH_UP,
+            )
+            ticks = []
+            while missed < tick:
+                ticks.append(missed)
+                missed += td(minutes=1)
+            if ticks:
+                logger.info("Catching up %d missed minutes", len(ticks))
+                await process(fanout, ticks, keys)
+
+        while True:
+            await asyncio.sleep(
+                max((tick - dt.now(pytz.utc)).total_seconds(), 0)
+            )
+            if tick.minute % REBUCKET_EVERY == 0:
+                await user.rebucket(tick.replace(tzinfo=None))
+            submit(
+                fanout,
+                await journal.reclaim(OWNER, LEASE, tick - CATCH_UP),
+                keys,
+            )
+            await process(fanout, [tick], keys)
+
+            tick += td(minutes=1)
 
 
 def main():
@@ -20,25 +231,18 @@ def main():
         None
 
     Returns:
-        None. Runs an endless loop that continously fetches schedule times
-        and checks if a reminder is necessary.
+        None. Runs the reminder scheduler until the process is stopped.
     """
-    now = dt.now(pytz.timezone("Europe/Berlin"))
-    while True:
-        if dt.now().minute != now.minute:
-            now = dt.now(pytz.timezone("Europe/Berlin"))
-            users = u.find_all()
-
-            for user in users:
-                for reminder in user["reminder"]:
-                    dt_reminder = dt.strptime(reminder, "%H:%M")
-                    if (dt_reminder.hour == now.hour) and (
-                        dt_reminder.minute == now.minute
-                    ):
-                        msg = f"Hola {user['name']}! Es hora de aprender tu vocabulario. Escribe /play y podemos empezar."
-                        loop.run_until_complete(
-                            send(bot, user["user_id"], msg)
-                        )
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+    )
+    ensure_indexes()
+    migrate()
+    check_query_plans()
+
+    bot = Bot(token=os.environ["BOT_TOKEN"])
+    asyncio.run(remind(bot))
 
 
 if __name__ == "__main__":
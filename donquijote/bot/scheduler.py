@@ -0,0 +1,256 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta as td
+
+from donquijote.util.ratelimit import TokenBucket
+from donquijote.util.retry import PERMANENT, RETRY_AFTER, RetryPolicy, classify
+
+logger = logging.getLogger(__name__)
+
+
+def next_tick(now):
+    """
+    Returns the start of the minute following a point in time.
+
+    Args:
+        now (datetime): The point in time.
+
+    Returns:
+        datetime: The start of the next minute.
+    """
+    return now.replace(second=0, microsecond=0) + td(minutes=1)
+
+
+class TickReport:
+    """
+    Tracks the delivery of the messages submitted for one tick and logs the delivery latency
+    and the remaining backlog once the last message is done.
+
+    Attributes:
+        tick (datetime): The tick the messages were submitted for.
+        total (int): The number of submitted messages.
+        sent (int): The number of delivered messages.
+        failed (int): The number of messages that could not be delivered.
+        latency (float): The seconds from the submission to the latest delivery.
+        done (asyncio.Event): Set once every message is delivered or failed.
+
+    Methods:
+        record(self, sent, backlog): Records the outcome of one message.
+    """
+
+    def __init__(self, tick, total, clock=time.monotonic):
+        """
+        Initializes the report at the time of the submission.
+
+        Args:
+            tick (datetime): The tick the messages were submitted for.
+            total (int): The number of submitted messages.
+            clock (Callable[[], float], optional): The clock used to measure the latency.
+
+        Returns:
+            None
+        """
+        self.tick = tick
+        self.total = total
+        self.sent = 0
+        self.failed = 0
+        self.latency = 0.0
+        self.clock = clock
+        self.started = clock()
+        self.done = asyncio.Event()
+        if not total:
+            self.done.set()
+
+    def record(self, sent, backlog):
+        """
+        Records the outcome of one message and logs the report after the last one.
+
+        Args:
+            sent (bool): True if the message was delivered, False if it failed.
+            backlog (int): The number of messages still queued.
+
+        Returns:
+            None
+        """
+        if sent:
+            self.sent += 1
+            self.latency = self.clock() - self.started
+        else:
+            self.failed += 1
+
+        if self.sent + self.failed == self.total:
+            self.done.set()
+            logger.info(
+                "Tick %s: sent %d/%d reminders (%d failed) in %.1fs, backlog %d",
+                self.tick.strftime("%H:%M"),
+                self.sent,
+                self.total,
+                self.failed,
+                self.latency,
+                backlog,
+            )
+
+
+class Fanout:
+    """
+    Delivers messages through a pool of asyncio workers. All workers share a global token
+    bucket sized to the bulk limit of the Telegram API, and messages to the same chat are
+    spaced by a minimum interval. A RetryAfter pauses the whole bucket and requeues the
+    message, transient errors requeue it after an exponential backoff, and permanent errors
+    fail it right away. Ticks only submit to the queue, so a large tick never delays the
+    ticks that follow.
+
+    Attributes:
+        send (Callable[[int, str], Awaitable]): Sends a text to a chat.
+        on_result (Callable[[datetime, int, bool], Awaitable]): Called with the tick, the chat ID
+            and whether the message was delivered once a message is done, None to skip.
+        workers (int): The number of concurrent workers.
+        bucket (TokenBucket): The global token bucket.
+        chat_interval (float): The minimum number of seconds between two messages to a chat.
+        max_attempts (int): The number of attempts per message.
+        backoff (Callable[[int], float]): Returns the wait before retrying a transient error.
+        queue (asyncio.Queue): The messages waiting for delivery.
+
+    Methods:
+        start(self): Starts the workers.
+        stop(self): Cancels the workers.
+        backlog(self): Returns the number of queued messages.
+        submit(self, tick, messages): Queues the messages of a tick.
+    """
+
+    def __init__(
+        self,
+        send,
+        workers=16,
+        rate=30.0,
+        chat_interval=1.0,
+        max_attempts=3,
+        retry_delay=0.5,
+        on_result=None,
+    ):
+        """
+        Initializes the fan-out without starting the workers.
+
+        Args:
+            send (Callable[[int, str], Awaitable]): Sends a text to a chat.
+            workers (int, optional): The number of concurrent workers.
+            rate (float, optional): The global number of messages per second.
+            chat_interval (float, optional): The minimum number of seconds between two messages
+                to the same chat.
+            max_attempts (int, optional): The number of attempts per message.
+            retry_delay (float, optional): The backoff of the first retry of a transient error
+                in seconds.
+            on_result (Callable[[datetime, int, bool], Awaitable], optional): Called once a
+                message is delivered or failed.
+
+        Returns:
+            None
+        """
+        self.send = send
+        self.on_result = on_result
+        self.workers = workers
+        self.bucket = TokenBucket(rate)
+        self.chat_interval = chat_interval
+        self.max_attempts = max_attempts
+        self.backoff = RetryPolicy(base_delay=retry_delay).backoff
+        self.queue = asyncio.Queue()
+        self._next_send = {}
+        self._tasks = []
+
+    def start(self):
+        """
+        Starts the workers on the running event loop.
+
+        Returns:
+            None
+        """
+        self._tasks = [
+            asyncio.create_task(self._work()) for _ in range(self.workers)
+        ]
+
+    async def stop(self):
+        """
+        Cancels the workers.
+
+        Returns:
+            None
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def backlog(self):
+        """
+        Returns the number of messages waiting for delivery.
+
+        Returns:
+            int: The number of queued messages.
+        """
+        return self.queue.qsize()
+
+    def submit(self, tick, messages):
+        """
+        Queues the messages of a tick.
+
+        Args:
+            tick (datetime): The tick the messages belong to.
+            messages (List[Tuple[int, str]]): The chat ID and text of every message.
+
+        Returns:
+            TickReport: The report that tracks the delivery of the messages.
+        """
+        now = time.monotonic()
+        self._next_send = {
+            chat_id: at for chat_id, at in self._next_send.items() if at > now
+        }
+
+        report = TickReport(tick, len(messages))
+        for chat_id, text in messages:
+            self.queue.put_nowait((report, chat_id, text, 1))
+
+        return report
+
+    async def _wait_for_chat(self, chat_id):
+        now = time.monotonic()
+        at = max(self._next_send.get(chat_id, now), now)
+        self._next_send[chat_id] = at + self.chat_interval
+        if at > now:
+            await asyncio.sleep(at - now)
+
+    async def _done(self, report, chat_id, sent):
+        report.record(sent, self.backlog())
+        if self.on_result is not None:
+            try:
+                await self.on_result(report.tick, chat_id, sent)
+            except Exception:
+                logger.exception("Failed to record the result for %s", chat_id)
+
+    async def _work(self):
+        while True:
+            report, chat_id, text, attempt = await self.queue.get()
+            try:
+                await self._wait_for_chat(chat_id)
+                await self.bucket.acquire()
+                await self.send(chat_id, text)
+            except Exception as e:
+                kind = classify(e)
+                retry = (report, chat_id, text, attempt + 1)
+                if kind == RETRY_AFTER:
+                    self.bucket.pause(e.retry_after)
+
+                if kind == PERMANENT or attempt >= self.max_attempts:
+                    logger.exception("Failed to send a message to %s", chat_id)
+                    await self._done(report, chat_id, False)
+                elif kind == RETRY_AFTER:
+                    self.queue.put_nowait(retry)
+                else:
+                    # Requeued later instead of waiting here, so the worker stays free.
+                    asyncio.get_running_loop().call_later(
+                        self.backoff(attempt), self.queue.put_nowait, retry
+                    )
+            else:
+                await self._done(report, chat_id, True)
+            finally:
+                self.queue.task_done()
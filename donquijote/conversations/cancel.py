@@ -1,9 +1,10 @@
 from telegram import ReplyKeyboardRemove, Update
 from telegram.ext import ContextTypes, ConversationHandler
 
-from donquijote.conversations.helpers import send
+from donquijote.conversations.helpers import coalesce, send
 
 
+@coalesce
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Function to cancel and end the conversation.
 
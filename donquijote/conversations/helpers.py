@@ -1,10 +1,209 @@
-import time
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+
+from telegram.error import BadRequest
+
+from donquijote.util.ratelimit import RateLimiter
+from donquijote.util.retry import CircuitBreaker, RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+RETRY_POLICY = RetryPolicy(
+    max_attempts=int(os.environ.get("TELEGRAM_MAX_ATTEMPTS", 5)),
+    deadline=float(os.environ.get("TELEGRAM_DEADLINE", 60)),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.environ.get("TELEGRAM_BREAKER_THRESHOLD", 5)),
+        reset_timeout=float(os.environ.get("TELEGRAM_BREAKER_TIMEOUT", 30)),
+    ),
+)
+# Each process paces only its own calls, but both bots send with the same bot token. The
+# conversation bot (TELEGRAM_RATE) and the reminder bot (REMINDER_RATE) split the bulk limit
+# of 30 messages per second between them, so their sum must stay at or below it.
+RATE_LIMITER = RateLimiter(
+    rate=float(os.environ.get("TELEGRAM_RATE", 20)),
+    chat_rate=float(os.environ.get("TELEGRAM_CHAT_RATE", 1)),
+    chat_burst=float(os.environ.get("TELEGRAM_CHAT_BURST", 3)),
+)
+MAX_MESSAGE_LENGTH = 4096
+SEPARATOR = "\n\n"
+
+_outbox = contextvars.ContextVar("outbox", default=None)
+
+
+class PendingMessage:
+    """A text queued by send. Within a coalesced handler it is sent together with the
+    other texts to the same chat once the handler returns, possibly merged into one
+    message with them.
+
+    Attributes:
+        text (str): The text of the message
+        reply_markup (telegram._replykeyboardmarkup.ReplyKeyboardMarkup): The reply keyboard
+        message (telegram.Message): The sent message that contains the text, None until
+            it is sent or if it couldn't be sent
+        chunk (List[str]): The texts merged into the sent message
+        index (int): The position of the text in the chunk
+    """
+
+    def __init__(self, text, reply_markup=None):
+        self.text = text
+        self.reply_markup = reply_markup
+        self.message = None
+        self.chunk = [text]
+        self.index = 0
+        self._sent = asyncio.get_running_loop().create_future()
+
+    def __await__(self):
+        return asyncio.shield(self._sent).__await__()
+
+    def resolve(self, message, chunk, index):
+        """Records the sent message that contains the text.
+
+        Args:
+            message (telegram.Message): The sent message, None if it couldn't be sent
+            chunk (List[str]): The texts merged into the sent message
+            index (int): The position of the text in the chunk
+
+        Returns:
+            None
+        """
+        self.message, self.chunk, self.index = message, chunk, index
+        if not self._sent.done():
+            self._sent.set_result(message)
+
+    def replace(self, text):
+        """Returns the full text of the sent message with this text replaced.
+
+        Args:
+            text (str): The replacement
+
+        Returns:
+            str: The text of the sent message after the replacement.
+        """
+        chunk = list(self.chunk)
+        chunk[self.index] = text
+
+        return SEPARATOR.join(chunk)
+
+
+def chunks(pending):
+    """Groups consecutive texts into as few messages as the message length limit allows.
+    A text with a reply markup ends its message, so the markup stays on the message
+    that closes the group and the order of the texts is preserved.
+
+    Args:
+        pending (List[PendingMessage]): The queued texts of a chat in order
+
+    Returns:
+        List[List[PendingMessage]]: The texts of every message.
+    """
+    groups, length = [], 0
+    for p in pending:
+        if (
+            not groups
+            or groups[-1][-1].reply_markup is not None
+            or length + len(SEPARATOR) + len(p.text) > MAX_MESSAGE_LENGTH
+        ):
+            groups.append([])
+            length = -len(SEPARATOR)
+        groups[-1].append(p)
+        length += len(SEPARATOR) + len(p.text)
+
+    return groups
+
+
+async def _deliver(update, group):
+    texts = [p.text for p in group]
+    message = None
+    try:
+        message = await RETRY_POLICY.run(
+            RATE_LIMITER.limit(
+                update.effective_chat.id, update.message.reply_text
+            ),
+            SEPARATOR.join(texts),
+            reply_markup=group[-1].reply_markup,
+            read_timeout=30,
+            write_timeout=30,
+        )
+    except Exception:
+        logger.exception(
+            "Failed to send a message to %s", update.effective_chat.id
+        )
+
+    for i, p in enumerate(group):
+        p.resolve(message, texts, i)
+
+
+async def flush():
+    """Sends the texts queued in the current handler, one chat after the other and the
+    merged messages of a chat in order.
+
+    Returns:
+        None
+    """
+    outbox = _outbox.get() or {}
+    while outbox:
+        _, (update, pending) = outbox.popitem()
+        for group in chunks(pending):
+            await _deliver(update, group)
+
+
+def coalesce(handler):
+    """Decorator for conversation handlers that buffers the texts sent with send during
+    the handler and merges consecutive texts to the same chat into as few messages as
+    possible once the handler returns.
+
+    Args:
+        handler (Callable[[Update, CallbackContext], Awaitable[int]]): The handler
+
+    Returns:
+        Callable[[Update, CallbackContext], Awaitable[int]]: The coalescing handler.
+    """
+
+    @functools.wraps(handler)
+    async def wrapper(update, context):
+        token = _outbox.set({})
+        try:
+            return await handler(update, context)
+        finally:
+            try:
+                await flush()
+            finally:
+                _outbox.reset(token)
+
+    return wrapper
+
+
+async def log_rate_limiter_stats(context):
+    """Logs the queue depth and the wait times of RATE_LIMITER, see RateLimiter.stats.
+    Scheduled periodically by the conversation bot.
+
+    Args:
+        context (telegram.ext._callbackcontext.CallbackContext): The callback context
+
+    Returns:
+        None
+    """
+    logger.info(
+        "Rate limiter: %(waiting)d waiting, %(acquired)d sent, "
+        "average wait %(avg_wait).2fs, longest wait %(max_wait).2fs",
+        RATE_LIMITER.stats(),
+    )
 
 
 async def send(update, txt, reply_markup=None):
     """Helper function that wraps the python-telegram-bot reply_text funcionality
-    into a while loop with a try/except catch. This is not pretty but helps to prevent
-    that Telegram timeouts force the bot to get stuck in mid conversation.
+    into the rate limiter and the retry policy. Every attempt waits for a token of the
+    global bucket shared by all chats and of the bucket of the chat, so bursts are
+    queued instead of running into the API limits, see RATE_LIMITER. Timeouts and
+    network errors are retried with exponential backoff without blocking the event
+    loop, a RetryAfter is honoured and pauses the global bucket, and permanent errors,
+    e.g. a bot blocked by the user, give up right away.
+
+    Inside a coalesced handler the text is only queued and sent when the handler
+    returns, see coalesce. Otherwise it is sent right away.
 
     Args:
         update (telegram._update.Update): The update object
@@ -13,38 +212,54 @@ async def send(update, txt, reply_markup=None):
             that allows the user to push buttons inside the app (default: None)
 
     Returns:
-        None. Sends the message.
-
+        PendingMessage: The queued text. Await it for the sent message, which is None if
+            it couldn't be sent.
     """
-    while True:
-        try:
-            return await update.message.reply_text(
-                txt,
-                reply_markup=reply_markup,
-                read_timeout=30,
-                write_timeout=30,
-            )
-        except Exception:
-            time.sleep(3)
+    pending = PendingMessage(txt, reply_markup=reply_markup)
+    outbox = _outbox.get()
+
+    if outbox is None:
+        await _deliver(update, [pending])
+    else:
+        outbox.setdefault(update.effective_chat.id, (update, []))[1].append(
+            pending
+        )
+
+    return pending
 
 
 async def edit_message_text(context):
     """Helper function that wraps the python-telegram-bot edit_message_text function
-    into an endless loop with a try/except catch phrase to avoit Telegram timeouts to force
-    the bot into getting stuck mid conversation.
+    into the rate limiter and the retry policy, see send. It replaces the text of the
+    pending message in context.chat_data["correction"] with
+    context.chat_data["new_message"] and keeps the texts that were merged into the same
+    message. An edit that wouldn't change the message is not an error.
 
     Args:
         context (telegram.ext._callbackcontext.CallbackContext): The callback context
 
     Returns:
-        None. Edits the already sent text message.
+        telegram.Message: The edited message, None if it couldn't be edited.
     """
-    while True:
-        try:
-            return await context.bot.edit_message_text(
-                chat_id=context.chat_data["chat_id"],
-                message_id=context.chat_data["message_id"],
-                text=context.chat_data["new_message"],
+    correction = context.chat_data["correction"]
+    if correction.message is None:
+        return None
+
+    try:
+        return await RETRY_POLICY.run(
+            RATE_LIMITER.limit(
+                correction.message.chat_id, context.bot.edit_message_text
+            ),
+            chat_id=correction.message.chat_id,
+            message_id=correction.message.message_id,
+            text=correction.replace(context.chat_data["new_message"]),
+        )
+    except BadRequest as e:
+        if "message is not modified" not in str(e).lower():
+            logger.exception(
+                "Failed to edit message %s", correction.message.message_id
             )
-        except Exception:
-            time.sleep(3)
+    except Exception:
+        logger.exception(
+            "Failed to edit message %s", correction.message.message_id
+        )
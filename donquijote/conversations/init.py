@@ -3,14 +3,15 @@ from datetime import datetime as dt
 from telegram import ReplyKeyboardMarkup, ReplyKeyboardRemove, Update
 from telegram.ext import ContextTypes, ConversationHandler
 
-from donquijote.conversations.helpers import send
-from donquijote.db.mongodb import User
+from donquijote.conversations.helpers import coalesce, send
+from donquijote.db.asyncmongodb import AsyncUser
 from donquijote.util.util import int_cast, time_cast
 
-user = User()
+user = AsyncUser()
 AGREE, NAME, WORDS_PER_DAY, REMINDER, HOW_OFTEN, WHAT_TIME = range(6)
 
 
+@coalesce
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Function that starts the conversation.
 
@@ -49,6 +50,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return AGREE
 
 
+@coalesce
 async def agree(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Function that checks if the user agrees to learn vocabulary.
 
@@ -65,11 +67,11 @@ async def agree(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     context.chat_data["user_id"] = user_info["id"]
 
     if update.message.text.lower() == "yes":
-        if user.exists(user_info["id"]):
-            user_name = user.find(user_id=user_info["id"])["name"]
+        u = await user.find(user_id=user_info["id"])
+        if u is not None:
             await send(
                 update,
-                f"¡Hola {user_name}! Looks like we've talked before. Send /settings to view what we've set up before.",
+                f"¡Hola {u['name']}! Looks like we've talked before. Send /settings to view what we've set up before.",
                 reply_markup=ReplyKeyboardRemove(),
             )
 
@@ -99,6 +101,7 @@ async def agree(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         return AGREE
 
 
+@coalesce
 async def name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Function that lets the user input a name.
 
@@ -113,12 +116,12 @@ async def name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     name = update.message.text.strip()
     context.chat_data["name"] = name
 
-    user.insert(
+    await user.insert(
         user_id=user_info["id"],
         name=name,
         n_words=None,
         reminder=[],
-        sign_up=dt.now(),
+        sign_up=dt.utcnow(),
     )
 
     await send(update, f"Sounds good. I'll call you {name} from now on.")
@@ -130,6 +133,7 @@ async def name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return WORDS_PER_DAY
 
 
+@coalesce
 async def words_per_day(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> int:
@@ -154,7 +158,7 @@ async def words_per_day(
         return WORDS_PER_DAY
 
     context.chat_data["n_words"] = choice
-    user.update(
+    await user.update(
         user_id=context.chat_data["user_id"],
         update_dict={"$set": {"n_words": choice}},
     )
@@ -181,6 +185,7 @@ async def words_per_day(
     return REMINDER
 
 
+@coalesce
 async def reminder(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Function that lets the set up a learning schedule.
 
@@ -224,6 +229,7 @@ async def reminder(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         return REMINDER
 
 
+@coalesce
 async def how_often(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Function that lets the user define the number of reminders.
 
@@ -261,6 +267,7 @@ async def how_often(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return WHAT_TIME
 
 
+@coalesce
 async def what_time(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Function that lets the user define the reminder times.
 
@@ -286,9 +293,7 @@ async def what_time(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
     str_dict = {0: "first", 1: "second", 2: "third"}
 
-    user.update(
-        user_id=user_info["id"], update_dict={"$push": {"reminder": choice}}
-    )
+    await user.add_reminder(user_id=user_info["id"], reminder=choice)
     await send(
         update,
         f"Okay. I'll remind you the {str_dict[context.chat_data['current_i']]} time at {choice}",
@@ -3,8 +3,8 @@ import random
 from telegram import ReplyKeyboardMarkup, Update
 from telegram.ext import ContextTypes, ConversationHandler
 
-from donquijote.conversations.helpers import edit_message_text, send
-from donquijote.db.mongodb import SRS, Practice, User, Vocabulary
+from donquijote.conversations.helpers import coalesce, edit_message_text, send
+from donquijote.db.asyncmongodb import AsyncVocabulary
 from donquijote.util.const import FAILURE, INT_EMOJI_DICT, SRS_DICT, SUCCESS
 
 ABBRS_MAPPING = {
@@ -25,7 +25,7 @@ ABBRS_MAPPING = {
     "neuter": "n",
 }
 
-vocabulary = Vocabulary()
+vocabulary = AsyncVocabulary()
 
 
 def type_cast(inp):
@@ -54,6 +54,7 @@ def type_cast(inp):
         return range
 
 
+@coalesce
 async def learn(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Function that starts the learn conversation flow. This conversation lets
     the user pick a group of words (e.g. verbs, adjectives, nouns) and a range (e.g. 0-100)
@@ -85,6 +86,7 @@ async def learn(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return 0
 
 
+@coalesce
 async def which_word_group(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> int:
@@ -107,7 +109,7 @@ async def which_word_group(
         return 0
     else:
         context.chat_data["word_group"] = group
-        vocab_count = vocabulary.vocab_count(abbr=ABBRS_MAPPING[group])
+        vocab_count = await vocabulary.vocab_count(abbr=ABBRS_MAPPING[group])
         context.chat_data["vocab_count"] = vocab_count
         await send(
             update,
@@ -119,6 +121,7 @@ async def which_word_group(
         return 1
 
 
+@coalesce
 async def which_word_range(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> int:
@@ -142,7 +145,7 @@ async def which_word_range(
 
         return 1
 
-    vocabs = vocabulary.range(
+    vocabs = await vocabulary.range(
         start=range[0],
         end=range[1],
         abbr=ABBRS_MAPPING[context.chat_data["word_group"]],
@@ -162,6 +165,7 @@ async def which_word_range(
     return 2
 
 
+@coalesce
 async def play_learn(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> int:
@@ -177,7 +181,7 @@ async def play_learn(
         2, to return to the play_learn part of the conversation
     """
     if len(context.chat_data["vocabs"]) > 0:
-        if context.chat_data.get("message_id", None):
+        if context.chat_data.get("correction", None):
             await edit_message_text(context)
         context.chat_data["vocabs"][0]["attempts"] += 1
         vocab = context.chat_data["vocabs"][0]
@@ -185,8 +189,7 @@ async def play_learn(
         reply = update.message.text
 
         if reply.strip().lower() == vocab["sp"].strip().lower():
-            context.chat_data["chat_id"] = None
-            context.chat_data["message_id"] = None
+            context.chat_data["correction"] = None
             context.chat_data["new_message"] = None
             context.chat_data["vocabs_done"].append(vocab)
             await send(
@@ -195,12 +198,10 @@ async def play_learn(
             )
         else:
             failure_msg = random.choice(FAILURE)
-            correction = await send(
+            context.chat_data["correction"] = await send(
                 update,
                 f"{failure_msg.format(sp=vocab['sp'])}\n----------\n{vocab['sentence-sp']}",
             )
-            context.chat_data["chat_id"] = correction.chat_id
-            context.chat_data["message_id"] = correction.message_id
             context.chat_data["new_message"] = failure_msg.format(
                 sp="_________"
             )
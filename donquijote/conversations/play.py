@@ -1,20 +1,28 @@
+import asyncio
 import random
 from datetime import datetime as dt
-from datetime import timedelta as td
 
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 
-from donquijote.conversations.helpers import edit_message_text, send
-from donquijote.db.mongodb import SRS, Practice, User, Vocabulary
+from donquijote.conversations.helpers import coalesce, edit_message_text, send
+from donquijote.db.asyncmongodb import (
+    AsyncPractice,
+    AsyncSRS,
+    AsyncUser,
+    AsyncVocabulary,
+)
+from donquijote.util.bitset import Bitset
 from donquijote.util.const import FAILURE, INT_EMOJI_DICT, SRS_DICT, SUCCESS
+from donquijote.util.timezone import day_ordinal, day_start
 
-user = User()
-vocabulary = Vocabulary()
-practice = Practice()
-srs = SRS()
+user = AsyncUser()
+vocabulary = AsyncVocabulary()
+practice = AsyncPractice()
+srs = AsyncSRS()
 
 
+@coalesce
 async def play(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Function that starts the play conversation flow. This conversation  picks a set
     of words for the user based on which words were already learned and the SRS schedule.
@@ -28,62 +36,56 @@ async def play(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         0, to continue to the vocab step of the conversation.
     """
     user_info = update.message.from_user
-    context.chat_data["chat_id"] = None
-    context.chat_data["message_id"] = None
+    context.chat_data["correction"] = None
     context.chat_data["new_message"] = None
 
-    if not user.exists(user_id=user_info["id"]):
-        await update.message.reply_text(
+    u = await user.find(user_id=user_info["id"])
+
+    if u is None:
+        await send(
+            update,
             f"¡Hola! You're not registered yet. Send /start so we can register you.",
         )
 
         return ConversationHandler.END
-    else:
-        u = user.find(user_id=user_info["id"])
-
-    if not practice.exists(user_id=u["user_id"], timestamp=dt.now()):
-        vocabs = []
-        all_srs = [
-            x["vocab_id"]
-            for x in srs.col.find(
-                {"user_id": u["user_id"]}, {"_id": 0, "vocab_id": 1}
-            )
-        ]
-        srs_repeat = list(
-            srs.repeat(
-                user_id=u["user_id"],
-                timestamp=dt.now().replace(
-                    hour=0, minute=0, second=0, microsecond=0
-                ),
-            )
+
+    p = None
+    if user.practiced_on(u, day_ordinal(u.get("tz"))):
+        p = await practice.find(
+            user_id=u["user_id"], timestamp=dt.utcnow(), tz=u.get("tz")
         )
-        if len(srs_repeat) > 0:
-            vocab_list = [x["vocab_id"] for x in srs_repeat]
-            vocabs += list(vocabulary.from_vocab_list(vocab_list=vocab_list))
-
-        if len(vocabs) < u["n_words"]:
-            vocabs += list(
-                vocabulary.sample(
-                    n_words=u["n_words"] - len(vocabs),
-                    nin=all_srs,
-                )
-            )
 
-        for vocab in vocabs:
-            if not srs.exists(
-                user_id=u["user_id"], vocab_id=vocab["vocab_id"]
-            ):
-                srs.insert(user_id=u["user_id"], vocab_id=vocab["vocab_id"])
+    if p is None:
+        if "learned" not in u:
+            seen = await srs.vocab_ids(user_id=u["user_id"])
+            await user.learn(user_id=u["user_id"], vocab_ids=seen)
+            u["learned"] = Bitset.masks(seen)
+
+        vocabs, frontier = await srs.deck(
+            user_id=u["user_id"],
+            timestamp=day_start(u.get("tz")),
+            n_words=u["n_words"],
+            max_vocabs=u.get("max_vocabs"),
+            learned=Bitset(u["learned"]),
+            frontier=u.get("frontier", 0),
+        )
+        vocab_ids = [v["vocab_id"] for v in vocabs]
+
+        await asyncio.gather(
+            srs.enroll(user_id=u["user_id"], vocab_ids=vocab_ids),
+            user.learn(
+                user_id=u["user_id"], vocab_ids=vocab_ids, frontier=frontier
+            ),
+        )
     else:
-        p = practice.find(user_id=u["user_id"], timestamp=dt.now())
-        vocabs = list(vocabulary.from_vocab_list(vocab_list=p["vocabs"]))
+        vocabs = await vocabulary.from_vocab_list(vocab_list=p["vocabs"])
 
     random.shuffle(vocabs)
 
     context.chat_data["practice"] = {
-        "practice_id": practice.max_id() + 1,
+        "practice_id": await practice.next_id(),
         "user_id": u["user_id"],
-        "timestamp": dt.now(),
+        "timestamp": dt.utcnow(),
         "vocabs": [v["vocab_id"] for v in vocabs],
         "attempts": {str(v["vocab_id"]): 0 for v in vocabs},
     }
@@ -99,7 +101,7 @@ async def play(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return 0
 
 
-def progress(srs_item, attempts):
+def progress(srs_item, attempts, tz="UTC"):
     """Function that helps to determine the SRS steps of the learned
     vocabulary. A voabulary travels through different stages and each stage
     is linked to a different time horizon of the next time the vocabulary will
@@ -108,19 +110,22 @@ def progress(srs_item, attempts):
     is guessed incorrectly it will fall one level lower and set to 'quick_repeat'.
     Quick repeat means that, ignoring the SRS level, the vocabulary will be tested
     on the next day as long as it was guessed correctly. If a vocabulary reaches stage 5
-    it's timestamp for the next test will be set to 1.1.2099, meaning that learning this
-    vocabulary has finished.
+    it's timestamp for the next test will be set to 1.1.2099 and it is flagged as graduated,
+    meaning that learning this vocabulary has finished.
 
     Args:
         srs_item (dict): Dictionary of the SRS item. Contains the level, last_learn timestamp,
             next_learn timestamp, and the quick_repeat flag.
         attempts (int): The number of attempts required to correctly guess the vocabulary.
             Everything larger than 1 is incorrect, as the vocabulary wasn't guessed on first try.
+        tz (str, optional): The name of the timezone of the user. The next test is due at local
+            midnight, stored as naive UTC time.
 
     Returns:
-        dict: The new SRS item dictionary with the updated timestamps, quick_repeat flag, and level.
+        dict: The new SRS item dictionary with the updated timestamps, quick_repeat flag, level
+            and graduated flag.
     """
-    srs_item["last_learn"] = dt.now()
+    srs_item["last_learn"] = dt.utcnow()
 
     if attempts == 1:
         if srs_item["quick_repeat"]:
@@ -129,15 +134,13 @@ def progress(srs_item, attempts):
             srs_item["level"] += 1
 
         if srs_item["level"] < 5:
-            srs_item["next_learn"] = srs_item["last_learn"].replace(
-                hour=0, minute=0, second=0, microsecond=0
-            ) + td(days=SRS_DICT[srs_item["level"]])
+            srs_item["next_learn"] = day_start(
+                tz, srs_item["last_learn"], days=SRS_DICT[srs_item["level"]]
+            )
         else:
             srs_item["next_learn"] = dt(2099, 1, 1)
     else:
-        srs_item["next_learn"] = srs_item["last_learn"].replace(
-            hour=0, minute=0, second=0, microsecond=0
-        ) + td(days=1)
+        srs_item["next_learn"] = day_start(tz, srs_item["last_learn"], days=1)
 
         if srs_item["level"] > 1:
             srs_item["level"] -= 1
@@ -145,9 +148,12 @@ def progress(srs_item, attempts):
         else:
             srs_item["quick_repeat"] = False
 
+    srs_item["graduated"] = srs_item["level"] >= 5
+
     return srs_item
 
 
+@coalesce
 async def vocab(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Function that continues the play conversation flow. The bot sends English words,
     waits for a Spanish response, and checks if the response is correct. This process
@@ -162,7 +168,7 @@ async def vocab(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         0, to return to the vocab step of the conversation
     """
     if len(context.chat_data["vocabs"]) > 0:
-        if context.chat_data["message_id"]:
+        if context.chat_data["correction"]:
             await edit_message_text(context)
         vocab = context.chat_data["vocabs"][0]
         context.chat_data["practice"]["attempts"][str(vocab["vocab_id"])] += 1
@@ -170,8 +176,7 @@ async def vocab(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         reply = update.message.text
 
         if reply.strip().lower() == vocab["sp"].strip().lower():
-            context.chat_data["chat_id"] = None
-            context.chat_data["message_id"] = None
+            context.chat_data["correction"] = None
             context.chat_data["new_message"] = None
             await send(
                 update,
@@ -179,12 +184,10 @@ async def vocab(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
             )
         else:
             failure_msg = random.choice(FAILURE)
-            correction = await send(
+            context.chat_data["correction"] = await send(
                 update,
                 f"{failure_msg.format(sp=vocab['sp'])}\n----------\n{vocab['sentence-sp']}",
             )
-            context.chat_data["chat_id"] = correction.chat_id
-            context.chat_data["message_id"] = correction.message_id
             context.chat_data["new_message"] = failure_msg.format(
                 sp="_________"
             )
@@ -197,41 +200,43 @@ async def vocab(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         )
         return 0
     else:
-        streak = user.find(context.chat_data["practice"]["user_id"])["streak"]
-        if not practice.exists(
-            user_id=context.chat_data["practice"]["user_id"],
-            timestamp=dt.now(),
-        ):
-            if practice.exists(
-                user_id=context.chat_data["practice"]["user_id"],
-                timestamp=dt.now() - td(days=1),
-            ):
+        u = await user.find(context.chat_data["practice"]["user_id"])
+        streak = u["streak"]
+        today = day_ordinal(u.get("tz"))
+        if not user.practiced_on(u, today):
+            if user.practiced_on(u, today - 1):
                 streak += 1
             else:
                 streak = 1
-            user.update(
-                context.chat_data["practice"]["user_id"],
-                update_dict={"$set": {"streak": streak}},
-            )
 
-            upgrades, downgrades, remains = [], [], []
-            for v, a in context.chat_data["practice"]["attempts"].items():
-                srs_item = srs.find(
-                    user_id=context.chat_data["practice"]["user_id"],
-                    vocab_id=int(v),
+            user_id = context.chat_data["practice"]["user_id"]
+            attempts = {
+                int(v): a
+                for v, a in context.chat_data["practice"]["attempts"].items()
+            }
+            srs_items = {
+                x["vocab_id"]: x
+                for x in await srs.find_many(
+                    user_id=user_id, vocab_ids=list(attempts)
+                )
+            }
+            vocabs = {
+                x["vocab_id"]: x
+                for x in await vocabulary.from_vocab_list(
+                    vocab_list=list(attempts)
                 )
+            }
+
+            upgrades, downgrades, remains = [], [], []
+            for v, a in attempts.items():
+                srs_item = srs_items[v]
                 srs_update = {
                     "level_pre": srs_item["level"],
                     "level_post": None,
-                    "vocab": vocabulary.find(vocab_id=int(v)),
+                    "vocab": vocabs[v],
                 }
-                srs_item = progress(srs_item, a)
+                srs_item = progress(srs_item, a, tz=u.get("tz"))
                 srs_update["level_post"] = srs_item["level"]
-                srs.update(
-                    user_id=context.chat_data["practice"]["user_id"],
-                    vocab_id=int(v),
-                    update_dict={"$set": srs_item},
-                )
 
                 if srs_update["level_post"] > srs_update["level_pre"]:
                     upgrades.append(srs_update)
@@ -240,6 +245,14 @@ async def vocab(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
                 else:
                     remains.append(srs_update)
 
+            await asyncio.gather(
+                srs.bulk_update(
+                    user_id=user_id, srs_items=list(srs_items.values())
+                ),
+                user.practiced(user_id=user_id, day=today, streak=streak),
+                practice.insert(**context.chat_data["practice"]),
+            )
+
             await send(
                 update,
                 f"Awesome! You've just finished learning your words. "
@@ -279,12 +292,12 @@ async def vocab(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
                 f"You are currently on a {streak} day streak! "
                 f"See you soon 😇.",
             )
-
-        practice.insert(**context.chat_data["practice"])
+            await practice.insert(**context.chat_data["practice"])
 
         return ConversationHandler.END
 
 
+@coalesce
 async def counts(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Function that allows the user to mark incorrectly answered words as correct.
     This is useful if there was a typo or the smartphone's autocorrect messed up the
@@ -1,18 +1,21 @@
 from telegram import ReplyKeyboardMarkup, ReplyKeyboardRemove, Update
 from telegram.ext import ContextTypes, ConversationHandler
 
-from donquijote.conversations.helpers import send
+from donquijote.conversations.helpers import coalesce, send
 from donquijote.conversations.init import REMINDER
-from donquijote.db.mongodb import User
+from donquijote.db.asyncmongodb import AsyncUser
+from donquijote.util.timezone import is_timezone
 from donquijote.util.util import int_cast
 
-user = User()
+user = AsyncUser()
 SETTINGS_ROUTER = 0
 CHANGE_NAME = 1
 CHANGE_WORDS = 6
 CHANGE_MAX_VOCABS = 7
+CHANGE_TIMEZONE = 8
 
 
+@coalesce
 async def settings(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Function that starts the settings conversations flow. This flow allows the
     user to change settings such as name, learning schedule, number of vocabs.
@@ -25,9 +28,13 @@ async def settings(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         0, to continue to the SETTINGS_ROUTER step of the conversation
     """
     user_info = update.message.from_user
-    reply_keyboard = [["Name", "Reminder"], ["Words A Day", "Max Vocabs"]]
+    reply_keyboard = [
+        ["Name", "Reminder"],
+        ["Words A Day", "Max Vocabs"],
+        ["Timezone"],
+    ]
 
-    if not user.exists(user_id=user_info["id"]):
+    if not await user.exists(user_id=user_info["id"]):
         await send(
             update,
             f"¡Hola! You're not a registered. Send /start so we can register you.",
@@ -35,7 +42,7 @@ async def settings(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
     await send(
         update,
-        f"You can change your name, deactivate/set your reminders or change the number of words to learn per day.",
+        f"You can change your name, deactivate/set your reminders, change the number of words to learn per day or set your timezone.",
         reply_markup=ReplyKeyboardMarkup(
             reply_keyboard,
             input_field_placeholder="Change settings",
@@ -45,6 +52,7 @@ async def settings(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return SETTINGS_ROUTER
 
 
+@coalesce
 async def settings_router(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> int:
@@ -60,6 +68,7 @@ async def settings_router(
         3, to proceed to the REMINDER step of the conversation
         6, to proceed to the CHANGE_WORDS step of the conversation
         7, to proceed to the CHANGE_MAX_VOCABS step of the conversation
+        8, to proceed to the CHANGE_TIMEZONE step of the conversation
     """
     user_info = update.message.from_user
     choice = update.message.text
@@ -74,9 +83,7 @@ async def settings_router(
         return CHANGE_NAME
     elif choice == "Reminder":
         reply_keyboard = [["Yes", "No"]]
-        user.update(
-            user_id=user_info["id"], update_dict={"$set": {"reminder": []}}
-        )
+        await user.schedule(user_id=user_info["id"], reminder=[])
         await send(
             update,
             f"Let's set up your new learning schedule. Do you want to receive any reminders? (Yes/No)",
@@ -103,15 +110,24 @@ async def settings_router(
         )
 
         return CHANGE_MAX_VOCABS
+    elif choice == "Timezone":
+        await send(
+            update,
+            "Sure, which timezone are you in? Send me its name, e.g. Europe/Madrid or America/Mexico_City.",
+            reply_markup=ReplyKeyboardRemove(),
+        )
+
+        return CHANGE_TIMEZONE
     else:
         await send(
             update,
-            "Oops. Somethings wrong with your input. Send one of the following responses: 'Name', 'Reminder', 'Words A Day', 'Max Vocabs'.",
+            "Oops. Somethings wrong with your input. Send one of the following responses: 'Name', 'Reminder', 'Words A Day', 'Max Vocabs', 'Timezone'.",
         )
 
         return SETTINGS_ROUTER
 
 
+@coalesce
 async def change_name(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> int:
@@ -126,7 +142,7 @@ async def change_name(
     """
     user_info = update.message.from_user
 
-    user.update(
+    await user.update(
         user_id=user_info["id"],
         update_dict={"$set": {"name": update.message.text.strip()}},
     )
@@ -138,6 +154,7 @@ async def change_name(
     return ConversationHandler.END
 
 
+@coalesce
 async def change_words(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> int:
@@ -161,7 +178,7 @@ async def change_words(
 
         return CHANGE_WORDS
 
-    user.update(
+    await user.update(
         user_id=user_info["id"],
         update_dict={"$set": {"n_words": choice}},
     )
@@ -171,6 +188,7 @@ async def change_words(
     return ConversationHandler.END
 
 
+@coalesce
 async def change_max_vocabs(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> int:
@@ -195,7 +213,7 @@ async def change_max_vocabs(
 
         return CHANGE_MAX_VOCABS
 
-    user.update(
+    await user.update(
         user_id=user_info["id"],
         update_dict={"$set": {"max_vocabs": choice}},
     )
@@ -206,3 +224,39 @@ async def change_max_vocabs(
     )
 
     return ConversationHandler.END
+
+
+@coalesce
+async def change_timezone(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+) -> int:
+    """Function that lets the user change the timezone. Reminders and the start of a new
+    learning day follow the local time of the timezone.
+
+    Args:
+        update (telegram._update.Update): The update object
+        context (telegram.ext._callbackcontext.CallbackContext): The callback context
+
+    Returns:
+        -1, if the timezone change was successful, terminates the conversation
+        8, if the user input was wrong, to return to the CHANGE_TIMEZONE step of the conversation
+    """
+    user_info = update.message.from_user
+    choice = update.message.text.strip()
+
+    if not is_timezone(choice):
+        await send(
+            update,
+            "Oops. I don't know that timezone. Please send me a name like Europe/Madrid.",
+        )
+
+        return CHANGE_TIMEZONE
+
+    await user.schedule(user_id=user_info["id"], tz=choice)
+
+    await send(
+        update,
+        f"Okay, your reminders and learning days follow the time in {choice} from now on.",
+    )
+
+    return ConversationHandler.END
@@ -0,0 +1,120 @@
+import asyncio
+import functools
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo.command_cursor import CommandCursor
+from pymongo.cursor import Cursor
+
+from donquijote.db.mongodb import (
+    CLIENT_OPTIONS,
+    SRS,
+    Practice,
+    ReminderJournal,
+    User,
+    Vocabulary,
+)
+
+_executor = ThreadPoolExecutor(
+    max_workers=CLIENT_OPTIONS["maxPoolSize"], thread_name_prefix="mongo"
+)
+
+
+def _call(method, *args, **kwargs):
+    """
+    Calls a synchronous DAO method and drains returned cursors, so that no
+    lazy network I/O leaks back into the event loop.
+
+    Args:
+        method (Callable): The bound DAO method to call.
+        *args: Positional arguments for the method.
+        **kwargs: Keyword arguments for the method.
+
+    Returns:
+        Any: The result of the method, with cursors converted to lists.
+    """
+    result = method(*args, **kwargs)
+
+    if isinstance(result, (Cursor, CommandCursor)):
+        return list(result)
+
+    return result
+
+
+class AsyncMongo:
+    """
+    An executor-backed adapter that exposes the methods of a synchronous DAO as coroutines.
+
+    Every public method of the wrapped DAO runs on a shared thread pool that is sized like
+    the MongoClient connection pool, so a slow query only occupies a worker thread instead
+    of blocking the asyncio event loop of the bot.
+
+    Attributes:
+        dao (type): The synchronous DAO class to wrap.
+        sync (Mongo): The wrapped synchronous DAO instance.
+    """
+
+    dao = None
+
+    def __init__(self):
+        """
+        Initializes the adapter and the wrapped synchronous DAO.
+
+        Returns:
+            None
+        """
+        self.sync = self.dao()
+
+    def __getattr__(self, name):
+        """
+        Returns the attribute of the wrapped DAO. Methods are returned as coroutine functions.
+
+        Args:
+            name (str): The name of the attribute.
+
+        Returns:
+            Any: A coroutine function for DAO methods, the plain attribute otherwise.
+        """
+        attr = getattr(self.sync, name)
+
+        if not inspect.ismethod(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def method(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                _executor, functools.partial(_call, attr, *args, **kwargs)
+            )
+
+        return method
+
+
+class AsyncUser(AsyncMongo):
+    """Async variant of the User DAO."""
+
+    dao = User
+
+
+class AsyncVocabulary(AsyncMongo):
+    """Async variant of the Vocabulary DAO."""
+
+    dao = Vocabulary
+
+
+class AsyncPractice(AsyncMongo):
+    """Async variant of the Practice DAO."""
+
+    dao = Practice
+
+
+class AsyncSRS(AsyncMongo):
+    """Async variant of the SRS DAO."""
+
+    dao = SRS
+
+
+class AsyncReminderJournal(AsyncMongo):
+    """Async variant of the ReminderJournal DAO."""
+
+    dao = ReminderJournal
@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ProfileCache:
+    """
+    A thread-safe, size-bounded LRU cache whose entries expire after a fixed time to live.
+
+    Attributes:
+        maxsize (int): The maximum number of cached entries. The least recently used entry is
+            evicted first.
+        ttl (float): The number of seconds after which an entry expires.
+        hits (int): The number of lookups answered from the cache.
+        misses (int): The number of lookups that found no valid entry.
+
+    Methods:
+        get(self, key): Retrieves a cached value.
+        set(self, key, value): Caches a value.
+        invalidate(self, key): Removes a cached value.
+        clear(self): Removes all cached values.
+        stats(self): Returns the hit and miss counters and the current size.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, clock=time.monotonic):
+        """
+        Initializes an empty cache.
+
+        Args:
+            maxsize (int, optional): The maximum number of cached entries.
+            ttl (float, optional): The number of seconds after which an entry expires.
+            clock (Callable[[], float], optional): The clock used for expiry.
+
+        Returns:
+            None
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Retrieves a cached value and marks it as recently used.
+
+        Args:
+            key (Hashable): The key of the value.
+
+        Returns:
+            Any: The cached value, None if there is no valid entry for the key.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None or entry[0] <= self.clock():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return entry[1]
+
+    def set(self, key, value):
+        """
+        Caches a value and evicts the least recently used entry if the cache is full.
+
+        Args:
+            key (Hashable): The key of the value.
+            value (Any): The value to cache.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """
+        Removes a cached value.
+
+        Args:
+            key (Hashable): The key of the value.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Removes all cached values.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns the hit and miss counters and the current size of the cache.
+
+        Returns:
+            Dict[str, int]: The keys 'hits', 'misses' and 'size'.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+            }
@@ -0,0 +1,220 @@
+from datetime import datetime as dt
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from donquijote.db.mongodb import Counter, Mongo, Practice, User
+from donquijote.util.bitset import Bitset
+from donquijote.util.timezone import DEFAULT_TIMEZONE, day_ordinal, day_start
+
+
+def srs_graduated(db):
+    """
+    Flags every SRS item with whether it has graduated, i.e. reached level 5. Only items that
+    haven't graduated are part of the partial index behind the due queue.
+
+    Args:
+        db (Database): The database to migrate.
+
+    Returns:
+        None
+    """
+    db.srs.update_many(
+        {"graduated": {"$exists": False}, "level": {"$gte": 5}},
+        {"$set": {"graduated": True}},
+    )
+    db.srs.update_many(
+        {"graduated": {"$exists": False}}, {"$set": {"graduated": False}}
+    )
+
+
+def practice_buckets(db, batch_size=1000):
+    """
+    Copies the practice records of the former 'practice' collection, one document per session,
+    into the monthly buckets of the 'practice_buckets' collection and continues the practice_id
+    sequence after them. Sessions that are already in a bucket are skipped. The 'practice'
+    collection is left untouched.
+
+    Args:
+        db (Database): The database to migrate.
+        batch_size (int, optional): The number of sessions per bulk write.
+
+    Returns:
+        None
+    """
+
+    def flush(requests):
+        try:
+            db.practice_buckets.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            # An upsert of a session that is already in its bucket doesn't match the
+            # filter and collides with the existing bucket on the unique index.
+            if any(
+                error["code"] != 11000 for error in e.details["writeErrors"]
+            ):
+                raise
+
+    requests = []
+    for doc in db.practice.find({}, {"_id": 0}).sort("practice_id", 1):
+        bucket_filter, update = Practice.bucket_update(
+            practice_id=doc["practice_id"],
+            user_id=doc["user_id"],
+            timestamp=doc["timestamp"],
+            vocabs=doc["vocabs"],
+            attempts=doc["attempts"],
+        )
+        bucket_filter["sessions.practice_id"] = {"$ne": doc["practice_id"]}
+        requests.append(UpdateOne(bucket_filter, update, upsert=True))
+
+        if len(requests) >= batch_size:
+            flush(requests)
+            requests = []
+
+    if requests:
+        flush(requests)
+
+    Counter().seed("practice_id", Practice().max_id())
+
+
+def practiced_days(db, batch_size=1000):
+    """
+    Backfills the 'practiced_days' bitset and the 'last_practice_day' of every user from the
+    practice buckets. The days are the local dates of the sessions in the timezone of the user,
+    like the days /play records.
+
+    Args:
+        db (Database): The database to migrate.
+        batch_size (int, optional): The number of users per bulk write.
+
+    Returns:
+        None
+    """
+    timezones = {
+        u["user_id"]: u.get("tz")
+        for u in db.user.find({}, {"_id": 0, "user_id": 1, "tz": 1})
+    }
+
+    days = {}
+    for bucket in db.practice_buckets.find(
+        {}, {"_id": 0, "user_id": 1, "sessions.timestamp": 1}
+    ):
+        tz = timezones.get(bucket["user_id"]) or DEFAULT_TIMEZONE
+        days.setdefault(bucket["user_id"], set()).update(
+            day_ordinal(tz, session["timestamp"])
+            for session in bucket["sessions"]
+        )
+
+    requests = [
+        UpdateOne(
+            {"user_id": user_id},
+            {
+                "$bit": Bitset.bit_update("practiced_days", user_days),
+                "$max": {"last_practice_day": max(user_days)},
+            },
+        )
+        for user_id, user_days in days.items()
+    ]
+    for i in range(0, len(requests), batch_size):
+        db.user.bulk_write(requests[i : i + batch_size], ordered=False)
+
+    User.cache.clear()
+
+
+def user_timezones(db):
+    """
+    Assigns the default timezone to every user without one and precomputes the minutes of the
+    UTC day of their reminders, see User.rebucket.
+
+    Args:
+        db (Database): The database to migrate.
+
+    Returns:
+        None
+    """
+    db.user.update_many(
+        {"tz": {"$exists": False}},
+        {"$set": {"tz": DEFAULT_TIMEZONE, "utc_offset": None}},
+    )
+    User().rebucket()
+
+
+def srs_local_midnight(db, batch_size=1000):
+    """
+    Moves the next_learn of every SRS item that hasn't graduated from UTC midnight, where
+    progress used to schedule it, to the local midnight of its user, which the due queue is
+    now cut off at. Otherwise an item of a user east of UTC only became due a day late. Items
+    that are not scheduled at UTC midnight are left alone, so the migration can run again.
+
+    Args:
+        db (Database): The database to migrate.
+        batch_size (int, optional): The number of items per bulk write.
+
+    Returns:
+        None
+    """
+    timezones = {
+        u["user_id"]: u.get("tz")
+        for u in db.user.find({}, {"_id": 0, "user_id": 1, "tz": 1})
+    }
+
+    requests = []
+    for item in db.srs.find(
+        {"graduated": False, "next_learn": {"$ne": None}},
+        {"_id": 1, "user_id": 1, "next_learn": 1},
+    ):
+        next_learn = item["next_learn"]
+        if next_learn != next_learn.replace(
+            hour=0, minute=0, second=0, microsecond=0
+        ):
+            continue
+
+        local_midnight = day_start(
+            timezones.get(item["user_id"]) or DEFAULT_TIMEZONE, next_learn
+        )
+        if local_midnight != next_learn:
+            requests.append(
+                UpdateOne(
+                    {"_id": item["_id"], "next_learn": next_learn},
+                    {"$set": {"next_learn": local_midnight}},
+                )
+            )
+
+        if len(requests) >= batch_size:
+            db.srs.bulk_write(requests, ordered=False)
+            requests = []
+
+    if requests:
+        db.srs.bulk_write(requests, ordered=False)
+
+
+MIGRATIONS = [
+    ("srs_graduated", srs_graduated),
+    ("practice_buckets", practice_buckets),
+    ("practiced_days", practiced_days),
+    ("user_timezones", user_timezones),
+    ("srs_local_midnight", srs_local_midnight),
+]
+
+
+def migrate():
+    """
+    Applies all migrations that haven't been applied to the database yet and records them
+    in the 'migrations' collection. Every migration is idempotent, so two processes starting
+    at the same time may both run a pending migration without harm.
+
+    Returns:
+        None
+    """
+    db = Mongo().db
+    applied = {m["_id"] for m in db.migrations.find({}, {"_id": 1})}
+
+    for name, migration in MIGRATIONS:
+        if name not in applied:
+            migration(db)
+            db.migrations.update_one(
+                {"_id": name}, {"$set": {"applied": dt.now()}}, upsert=True
+            )
+
+
+if __name__ == "__main__":
+    migrate()
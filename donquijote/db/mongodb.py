@@ -1,24 +1,173 @@
+import logging
 import os
+import random
+import threading
+from datetime import datetime as dt
+from datetime import timedelta as td
+
+from pymongo import (
+    ASCENDING,
+    DESCENDING,
+    IndexModel,
+    MongoClient,
+    ReplaceOne,
+    ReturnDocument,
+    UpdateOne,
+)
+from pymongo.errors import BulkWriteError
+
+from donquijote.db.cache import ProfileCache
+from donquijote.db.vocabstore import VocabularyStore
+from donquijote.util.bitset import Bitset
+from donquijote.util.timezone import (
+    DEFAULT_TIMEZONE,
+    day_start,
+    utc_minutes,
+    utc_offset,
+)
+
+logger = logging.getLogger(__name__)
+
+CLIENT_OPTIONS = {
+    "maxPoolSize": int(os.environ.get("MONGO_MAX_POOL_SIZE", 20)),
+    "minPoolSize": int(os.environ.get("MONGO_MIN_POOL_SIZE", 0)),
+    "maxIdleTimeMS": int(os.environ.get("MONGO_MAX_IDLE_TIME_MS", 60000)),
+    "compressors": os.environ.get("MONGO_COMPRESSORS", "zlib"),
+}
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(uri=None):
+    """
+    Returns the process-wide MongoClient for the given URI, creating it on first use.
+
+    MongoClient is thread-safe and maintains its own connection pool, so every DAO
+    in a process borrows the same client instead of opening a pool of its own.
+    Pool size, idle timeout and compressors are configured via CLIENT_OPTIONS.
+
+    Args:
+        uri (str, optional): The MongoDB connection string. Defaults to the MONGO_URI
+            environment variable.
+
+    Returns:
+        MongoClient: The shared client for the given URI.
+    """
+    uri = uri or os.environ["MONGO_URI"]
+
+    with _clients_lock:
+        if uri not in _clients:
+            _clients[uri] = MongoClient(uri, **CLIENT_OPTIONS)
+
+        return _clients[uri]
+
+
+def close_clients():
+    """
+    Closes all shared MongoClients and empties the registry.
+
+    Returns:
+        None
+    """
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
 
-from pymongo import MongoClient
+
+class QueryPlanError(Exception):
+    """Raised when a hot query is answered by a collection scan instead of an index."""
 
 
 class Mongo:
     """A class for connecting to and interacting with a MongoDB database.
 
     Attributes:
-        client (MongoClient): A client object for connecting to the MongoDB server.
+        client (MongoClient): The shared client object for connecting to the MongoDB server.
         db (Database): A database object for interacting with the specified database.
+        indexes (List[IndexModel]): The indexes the collection of the subclass relies on.
 
     Methods:
-        __init__(self) -> None: Initializes the Mongo class and establishes a connection to the MongoDB server.
+        __init__(self) -> None: Initializes the Mongo class and borrows the shared client from the registry.
+        ensure_indexes(self) -> None: Creates the indexes of the collection if they don't exist yet.
+        drop_duplicates(self, keys) -> int: Removes the documents that share their keys with an earlier one.
     """
 
+    indexes = []
+
     def __init__(self) -> None:
-        """Initializes the Mongo class and establishes a connection to the MongoDB server."""
-        self.client = MongoClient(os.environ["MONGO_URI"])
+        """Initializes the Mongo class and borrows the shared client from the registry."""
+        self.client = get_client()
         self.db = self.client[os.environ["MONGO_DB"]]
 
+    def ensure_indexes(self) -> None:
+        """Creates the indexes of the collection. Existing indexes with the same
+        specification are left untouched, so this is safe to call on every startup.
+        Before a unique index is built for the first time, documents that would violate
+        it are removed, see drop_duplicates.
+        """
+        if not self.indexes:
+            return
+
+        existing = self.col.index_information()
+        for index in self.indexes:
+            document = index.document
+            if document.get("unique") and document["name"] not in existing:
+                self.drop_duplicates(list(document["key"]))
+
+        self.col.create_indexes(self.indexes)
+
+    def drop_duplicates(self, keys):
+        """Removes the documents that share the values of the keys with an earlier document,
+        so a unique index on the keys can be built. The earliest document by _id is kept,
+        which is also the one that updates matching the keys have been writing to. The
+        removed documents are copied to the '<collection>_duplicates' collection and
+        logged, so they can be inspected and merged by hand.
+
+        Args:
+            keys (List[str]): The fields of the unique index.
+
+        Returns:
+            int: The number of removed documents.
+        """
+        groups = self.col.aggregate(
+            [
+                {"$sort": {"_id": ASCENDING}},
+                {
+                    "$group": {
+                        "_id": {key: f"${key}" for key in keys},
+                        "ids": {"$push": "$_id"},
+                        "count": {"$sum": 1},
+                    }
+                },
+                {"$match": {"count": {"$gt": 1}}},
+            ],
+            allowDiskUse=True,
+        )
+
+        removed = 0
+        for group in groups:
+            ids = group["ids"][1:]
+            duplicates = list(self.col.find({"_id": {"$in": ids}}))
+            self.db[f"{self.col.name}_duplicates"].bulk_write(
+                [
+                    ReplaceOne({"_id": d["_id"]}, d, upsert=True)
+                    for d in duplicates
+                ]
+            )
+            self.col.delete_many({"_id": {"$in": ids}})
+            removed += len(ids)
+            logger.warning(
+                "Removed %d duplicates of %s %s, kept %s",
+                len(ids),
+                self.col.name,
+                group["_id"],
+                group["ids"][0],
+            )
+
+        return removed
+
 
 class User(Mongo):
     """
@@ -26,16 +175,39 @@ class User(Mongo):
 
     Attributes:
         col (Collection): A collection object for interacting with the 'user' collection.
+        cache (ProfileCache): The per-process cache of user documents shared by all instances. Writes
+            through this class refresh the cached document.
+        indexes (List[IndexModel]): A unique index on user_id, a multikey index on reminder_utc and an index on
+            tz and utc_offset.
 
     Methods:
         __init__(self): Initializes the User class and establishes a connection to the MongoDB server.
+        ensure_indexes(self): Creates the indexes and drops the former index on the local reminder times.
         find(self, user_id): Retrieves a single user document with the specified user ID.
         find_all(self): Retrieves a list of all user documents.
+        due_at(self, minutes): Retrieves the users with a reminder in one of the minutes of the UTC day.
+        schedule(self, user_id, reminder=None, tz=None): Sets the reminders or the timezone of a user.
+        add_reminder(self, user_id, reminder): Adds a reminder to the reminders of a user.
+        rebucket(self, now=None, batch_size=1000): Moves the reminders of users whose UTC offset changed.
         update(self, user_id, update_dict): Updates a single user document with the specified user ID and update dict.
-        insert(self, user_id, name, n_words, reminder, sign_up): Inserts a new user document into the 'user' collection.
+        insert(self, user_id, name, n_words, reminder, sign_up, tz=DEFAULT_TIMEZONE): Inserts a new user document
+            into the 'user' collection.
         exists(self, user_id): Returns True if a user document with the specified user ID exists, False otherwise.
+        learn(self, user_id, vocab_ids, frontier=None): Marks vocabularies as learned by the user.
+        practiced(self, user_id, day, streak): Records that the user completed a practice session on a day.
+        practiced_on(doc, day): Checks whether a user document records a practice session on a day.
     """
 
+    indexes = [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+        IndexModel([("reminder_utc", ASCENDING)]),
+        IndexModel([("tz", ASCENDING), ("utc_offset", ASCENDING)]),
+    ]
+    cache = ProfileCache(
+        maxsize=int(os.environ.get("USER_CACHE_SIZE", 1024)),
+        ttl=float(os.environ.get("USER_CACHE_TTL", 300)),
+    )
+
     def __init__(self):
         """
         Initializes the User class and establishes a connection to the MongoDB server.
@@ -46,17 +218,38 @@ class User(Mongo):
         super().__init__()
         self.col = self.db.user
 
+    def ensure_indexes(self):
+        """
+        Creates the indexes of the 'user' collection and drops the former index on the local
+        reminder times, which the index on the UTC reminder minutes replaces.
+
+        Returns:
+            None
+        """
+        if "reminder_1" in self.col.index_information():
+            self.col.drop_index("reminder_1")
+
+        super().ensure_indexes()
+
     def find(self, user_id):
         """
-        Retrieves a single user document with the specified user ID.
+        Retrieves a single user document with the specified user ID, from the cache if possible.
 
         Args:
             user_id (int): The user ID of the user document to retrieve.
 
         Returns:
-            Dict: The user document with the specified user ID.
+            Dict: A copy of the user document with the specified user ID, None if it doesn't exist.
         """
-        return self.col.find_one({"user_id": user_id})
+        doc = self.cache.get(user_id)
+
+        if doc is None:
+            doc = self.col.find_one({"user_id": user_id})
+            if doc is None:
+                return None
+            self.cache.set(user_id, doc)
+
+        return dict(doc)
 
     def find_all(self):
         """
@@ -67,6 +260,153 @@ class User(Mongo):
         """
         return list(self.col.find())
 
+    def due_at(self, minutes):
+        """
+        Retrieves the users with a reminder in one of the given minutes of the UTC day. The
+        query is answered from the multikey index on the precomputed 'reminder_utc' array.
+
+        Args:
+            minutes (List[int]): The minutes of the UTC day.
+
+        Returns:
+            Cursor: A cursor over the user documents with the fields user_id, name, tz,
+                reminder_utc and last_practice_day.
+        """
+        return self.col.find(
+            {"reminder_utc": {"$in": minutes}},
+            {
+                "_id": 0,
+                "user_id": 1,
+                "name": 1,
+                "tz": 1,
+                "reminder_utc": 1,
+                "last_practice_day": 1,
+            },
+        )
+
+    def schedule(self, user_id, reminder=None, tz=None):
+        """
+        Sets the reminders or the timezone of a user and precomputes the minutes of the UTC day
+        the reminders fall on at the current UTC offset of the timezone. The current values
+        are read from the collection, not the cache, so a change made through another process
+        isn't undone.
+
+        Args:
+            user_id (int): The user ID of the user document to update.
+            reminder (List[str], optional): The local reminder times in the format 'HH:MM',
+                defaults to the current reminders.
+            tz (str, optional): The name of the timezone, defaults to the current timezone.
+
+        Returns:
+            None
+        """
+        doc = (
+            self.col.find_one(
+                {"user_id": user_id}, {"_id": 0, "reminder": 1, "tz": 1}
+            )
+            or {}
+        )
+        reminder = doc.get("reminder", []) if reminder is None else reminder
+        tz = tz or doc.get("tz") or DEFAULT_TIMEZONE
+        offset = utc_offset(tz)
+
+        self.update(
+            user_id,
+            {
+                "$set": {
+                    "reminder": reminder,
+                    "tz": tz,
+                    "utc_offset": offset,
+                    "reminder_utc": utc_minutes(reminder, offset),
+                }
+            },
+        )
+
+    def add_reminder(self, user_id, reminder):
+        """
+        Adds a reminder to the reminders of a user with an atomic $push, so reminders changed
+        through another process in the meantime are kept, and precomputes the minutes of the
+        UTC day from the updated document. If the reminders changed again before that, the
+        minutes are left to the write that changed them.
+
+        Args:
+            user_id (int): The user ID of the user document to update.
+            reminder (str): The local reminder time in the format 'HH:MM'.
+
+        Returns:
+            None
+        """
+        doc = self.col.find_one_and_update(
+            {"user_id": user_id},
+            {"$push": {"reminder": reminder}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+        if doc is not None:
+            tz = doc.get("tz") or DEFAULT_TIMEZONE
+            offset = utc_offset(tz)
+            doc = self.col.find_one_and_update(
+                {"user_id": user_id, "reminder": doc["reminder"]},
+                {
+                    "$set": {
+                        "tz": tz,
+                        "utc_offset": offset,
+                        "reminder_utc": utc_minutes(doc["reminder"], offset),
+                    }
+                },
+                return_document=ReturnDocument.AFTER,
+            )
+
+        if doc is None:
+            self.cache.invalidate(user_id)
+        else:
+            self.cache.set(user_id, doc)
+
+    def rebucket(self, now=None, batch_size=1000):
+        """
+        Moves the reminders of all users whose timezone changed its UTC offset, e.g. at a DST
+        transition, to the minutes of the UTC day of the new offset. Only the users of the
+        affected timezones are read and they are updated in batches, so the check is cheap
+        enough to run regularly.
+
+        Args:
+            now (datetime, optional): The naive UTC time, defaults to the current time.
+            batch_size (int, optional): The number of users per bulk write.
+
+        Returns:
+            int: The number of moved users.
+        """
+        n_users = 0
+        for tz in self.col.distinct("tz"):
+            offset = utc_offset(tz, now)
+            requests = [
+                UpdateOne(
+                    {"user_id": doc["user_id"]},
+                    {
+                        "$set": {
+                            "utc_offset": offset,
+                            "reminder_utc": utc_minutes(
+                                doc.get("reminder") or [], offset
+                            ),
+                        }
+                    },
+                )
+                for doc in self.col.find(
+                    {"tz": tz, "utc_offset": {"$ne": offset}},
+                    {"_id": 0, "user_id": 1, "reminder": 1},
+                )
+            ]
+            for i in range(0, len(requests), batch_size):
+                self.col.bulk_write(
+                    requests[i : i + batch_size], ordered=False
+                )
+            n_users += len(requests)
+
+        if n_users:
+            self.cache.clear()
+
+        return n_users
+
     def update(self, user_id, update_dict):
         """
         Updates a single user document with the specified user ID.
@@ -78,9 +418,20 @@ class User(Mongo):
         Returns:
             None
         """
-        self.col.update_one({"user_id": user_id}, update_dict)
+        doc = self.col.find_one_and_update(
+            {"user_id": user_id},
+            update_dict,
+            return_document=ReturnDocument.AFTER,
+        )
 
-    def insert(self, user_id, name, n_words, reminder, sign_up):
+        if doc is None:
+            self.cache.invalidate(user_id)
+        else:
+            self.cache.set(user_id, doc)
+
+    def insert(
+        self, user_id, name, n_words, reminder, sign_up, tz=DEFAULT_TIMEZONE
+    ):
         """
         Inserts a new user document into the 'user' collection.
 
@@ -88,27 +439,96 @@ class User(Mongo):
             user_id (int): The user ID of the new user document.
             name (str): The name of the new user.
             n_words (int): The number of words the user has learned.
-            reminder (bool): A flag indicating whether the user wants to receive reminders.
+            reminder (List[str]): The local reminder times of the user.
             sign_up (datetime): The date and time the user signed up.
+            tz (str, optional): The name of the timezone of the user.
 
         Returns:
             None
         """
-        self.col.insert_one(
+        offset = utc_offset(tz)
+        doc = {
+            "user_id": user_id,
+            "name": name,
+            "n_words": n_words,
+            "reminder": reminder,
+            "max_vocabs": 30,
+            "sign_up": sign_up,
+            "streak": 0,
+            "learned": {},
+            "frontier": 0,
+            "practiced_days": {},
+            "tz": tz,
+            "utc_offset": offset,
+            "reminder_utc": utc_minutes(reminder, offset),
+        }
+        self.col.insert_one(doc)
+        self.cache.set(user_id, doc)
+
+    def learn(self, user_id, vocab_ids, frontier=None):
+        """
+        Marks vocabularies as learned by the user. The learned vocabularies are stored as a bitset
+        over the vocabulary IDs in the 'learned' field and updated atomically with $bit. The
+        frontier, the position in frequency order up to which every vocabulary has been learned,
+        only ever moves forward.
+
+        Args:
+            user_id (int): The user ID of the user document to update.
+            vocab_ids (List[int]): The IDs of the learned vocabularies.
+            frontier (int, optional): The new frontier of the user.
+
+        Returns:
+            None
+        """
+        update_dict = {"$bit": Bitset.bit_update("learned", vocab_ids)}
+        if frontier is not None:
+            update_dict["$max"] = {"frontier": frontier}
+
+        if update_dict["$bit"] or frontier is not None:
+            self.update(user_id, update_dict)
+
+    def practiced(self, user_id, day, streak):
+        """
+        Records that the user completed a practice session on a day. The days are stored as a
+        bitset over day ordinals in the 'practiced_days' field, next to the 'last_practice_day'
+        and the 'streak', and all three are written with a single update.
+
+        Args:
+            user_id (int): The user ID of the user document to update.
+            day (int): The ordinal of the day, see datetime.date.toordinal.
+            streak (int): The streak of the user including the day.
+
+        Returns:
+            None
+        """
+        self.update(
+            user_id,
             {
-                "user_id": user_id,
-                "name": name,
-                "n_words": n_words,
-                "reminder": reminder,
-                "max_vocabs": 30,
-                "sign_up": sign_up,
-                "streak": 0,
-            }
+                "$bit": Bitset.bit_update("practiced_days", [day]),
+                "$max": {"last_practice_day": day},
+                "$set": {"streak": streak},
+            },
         )
 
+    @staticmethod
+    def practiced_on(doc, day):
+        """
+        Checks whether a user document records a practice session on a day, without a query
+        against the practice history.
+
+        Args:
+            doc (Dict): The user document.
+            day (int): The ordinal of the day, see datetime.date.toordinal.
+
+        Returns:
+            bool: True if the user practiced on the day, False otherwise.
+        """
+        return day in Bitset(doc.get("practiced_days"))
+
     def exists(self, user_id):
         """
         Returns True if a user document with the specified user ID exists, False otherwise.
+        Shares the cached lookup with find.
 
         Args:
             user_id (int): The user ID to check for.
@@ -116,11 +536,7 @@ class User(Mongo):
         Returns:
             bool: True if a user document with the specified user ID exists, False otherwise.
         """
-        return (
-            True
-            if self.col.count_documents({"user_id": user_id}) > 0
-            else False
-        )
+        return self.find(user_id) is not None
 
 
 class Vocabulary(Mongo):
@@ -129,9 +545,18 @@ class Vocabulary(Mongo):
 
     Attributes:
         col (Collection): A collection object for interacting with the 'vocabulary' collection.
+        meta (Collection): A collection object for the precomputed metadata of the 'vocabulary' collection.
+        store (VocabularyStore): The in-memory copy of the vocabulary shared by all instances. Once loaded,
+            all read methods are answered from it without network I/O.
+        indexes (List[IndexModel]): A unique index on vocab_id and indexes on the precomputed frequency ranks.
 
     Methods:
         __init__(self): Initializes the Vocabulary class and establishes a connection to the MongoDB server.
+        ensure_indexes(self): Creates the indexes and precomputes the frequency ranks if they are outdated.
+        build_ranks(self): Precomputes the frequency rank of every vocabulary document and the counts per abbreviation.
+        reload(self): Loads the vocabulary collection into the shared in-memory store.
+        fresh(self, n_words, learned, frontier=0): Retrieves unlearned vocabulary documents from the front of
+            the frequency order.
         sample(self, n_words, nin=[]): Retrieves a list of vocabulary documents randomly sampled from the collection,
             excluding the ones with vocabulary IDs in the specified list.
         find(self, vocab_id): Retrieves a single vocabulary document with the specified vocabulary ID.
@@ -141,6 +566,14 @@ class Vocabulary(Mongo):
         from_vocab_list(self, vocab_list): Retrieves a list of vocabulary documents with the specified vocabulary IDs.
     """
 
+    indexes = [
+        IndexModel([("vocab_id", ASCENDING)], unique=True),
+        IndexModel([("abbr", ASCENDING), ("rank", ASCENDING)]),
+        IndexModel([("rank_all", ASCENDING)]),
+    ]
+    store = None
+    fresh_window = int(os.environ.get("VOCAB_FRESH_WINDOW", 50))
+
     def __init__(self):
         """
         Initializes the Vocabulary class and establishes a connection to the MongoDB server.
@@ -150,6 +583,70 @@ class Vocabulary(Mongo):
         """
         super().__init__()
         self.col = self.db.vocabulary
+        self.meta = self.db.vocabulary_meta
+
+    def ensure_indexes(self):
+        """
+        Creates the indexes of the 'vocabulary' collection and rebuilds the frequency ranks
+        if the collection changed since they were computed.
+
+        Returns:
+            None
+        """
+        super().ensure_indexes()
+
+        ranks = self.meta.find_one({"_id": "ranks"})
+        if ranks is None or ranks["total"] != self.col.count_documents({}):
+            self.build_ranks()
+
+    def build_ranks(self):
+        """
+        Precomputes the position of every vocabulary document when sorted by frequency, once within
+        its abbreviation ('rank') and once across the whole collection ('rank_all'), and stores the
+        number of vocabulary documents per abbreviation in the 'vocabulary_meta' collection.
+
+        Returns:
+            None
+        """
+        docs = list(
+            self.col.find({}, {"_id": 0, "vocab_id": 1, "abbr": 1}).sort(
+                [("freq", 1), ("vocab_id", 1)]
+            )
+        )
+        counts = {}
+        requests = []
+        for rank_all, doc in enumerate(docs):
+            rank = counts.get(doc["abbr"], 0)
+            counts[doc["abbr"]] = rank + 1
+            requests.append(
+                UpdateOne(
+                    {"vocab_id": doc["vocab_id"]},
+                    {"$set": {"rank": rank, "rank_all": rank_all}},
+                )
+            )
+
+        if requests:
+            self.col.bulk_write(requests, ordered=False)
+
+        self.meta.replace_one(
+            {"_id": "ranks"},
+            {"_id": "ranks", "total": len(docs), "counts": counts},
+            upsert=True,
+        )
+
+    def reload(self):
+        """
+        Loads the vocabulary collection into the in-memory store shared by all Vocabulary
+        instances of the process. Call again whenever the vocabulary collection changed.
+
+        Returns:
+            VocabularyStore: The new store.
+        """
+        Vocabulary.store = VocabularyStore(
+            self.col.find({}, {"_id": 0, "rank": 0, "rank_all": 0})
+        )
+
+        return Vocabulary.store
 
     def sample(self, n_words, nin=[]):
         """
@@ -165,6 +662,9 @@ class Vocabulary(Mongo):
             List[Dict]: A list of vocabulary documents randomly sampled from the collection,
                 excluding the ones with vocabulary IDs in the specified list.
         """
+        if self.store is not None:
+            return self.store.sample(n_words, exclude=set(nin))
+
         return self.col.aggregate(
             [
                 {"$match": {"vocab_id": {"$nin": nin}}},
@@ -173,6 +673,44 @@ class Vocabulary(Mongo):
             ]
         )
 
+    def fresh(self, n_words, learned, frontier=0):
+        """
+        Retrieves vocabulary documents the user hasn't learned yet, sampled from the first
+        'fresh_window' unlearned vocabularies in frequency order after the user's frontier.
+
+        Args:
+            n_words (int): The number of vocabulary documents to retrieve.
+            learned (Container[int]): The vocabulary IDs the user has learned, e.g. a Bitset.
+            frontier (int, optional): The position in frequency order up to which every
+                vocabulary has been learned.
+
+        Returns:
+            Tuple[List[Dict], int]: The sampled vocabulary documents and the new frontier.
+        """
+        if self.store is not None:
+            return self.store.fresh(
+                n_words, learned, frontier=frontier, window=self.fresh_window
+            )
+
+        cursor = self.col.find(
+            {"rank_all": {"$gte": frontier}}, {"_id": 0, "rank": 0}
+        ).sort("rank_all", 1)
+        candidates = []
+        for doc in cursor:
+            if doc["vocab_id"] not in learned:
+                candidates.append(doc)
+                if len(candidates) >= max(self.fresh_window, n_words):
+                    break
+        cursor.close()
+
+        picked = random.sample(candidates, min(n_words, len(candidates)))
+        frontier = candidates[0]["rank_all"] if candidates else frontier
+
+        return [
+            {k: v for k, v in doc.items() if k != "rank_all"}
+            for doc in sorted(picked, key=lambda d: d["rank_all"])
+        ], frontier
+
     def find(self, vocab_id):
         """
         Retrieves a single vocabulary document with the specified vocabulary ID.
@@ -183,6 +721,9 @@ class Vocabulary(Mongo):
         Returns:
             Dict: The vocabulary document with the specified vocabulary ID.
         """
+        if self.store is not None:
+            return self.store.find(vocab_id)
+
         return self.col.find_one({"vocab_id": vocab_id}, {"_id": 0})
 
     def range(self, start, end, abbr=None):
@@ -198,11 +739,17 @@ class Vocabulary(Mongo):
         Returns:
             List[Dict]: A list of vocabulary documents within the specified range, sorted by frequency.
         """
-        where = {}
+        if self.store is not None:
+            return self.store.range(start, end, abbr=abbr)
+
         if abbr:
-            where = {**where, **{"abbr": abbr}}
+            where = {"abbr": abbr, "rank": {"$gte": start, "$lt": end}}
+            sort = [("abbr", 1), ("rank", 1)]
+        else:
+            where = {"rank_all": {"$gte": start, "$lt": end}}
+            sort = [("rank_all", 1)]
 
-        return list(self.col.find(where).sort("freq", 1))[start:end]
+        return list(self.col.find(where).sort(sort))
 
     def vocab_count(self, abbr):
         """
@@ -214,7 +761,15 @@ class Vocabulary(Mongo):
         Returns:
             int: The number of vocabulary documents with the specified abbreviation.
         """
-        return self.col.count_documents({"abbr": abbr})
+        if self.store is not None:
+            return self.store.vocab_count(abbr)
+
+        ranks = self.meta.find_one({"_id": "ranks"}, {"counts": 1})
+
+        if ranks is None:
+            return self.col.count_documents({"abbr": abbr})
+
+        return ranks["counts"].get(abbr, 0)
 
     def from_vocab_list(self, vocab_list):
         """
@@ -226,6 +781,9 @@ class Vocabulary(Mongo):
         Returns:
             List[Dict]: A list of vocabulary documents with the specified vocabulary IDs.
         """
+        if self.store is not None:
+            return self.store.from_vocab_list(vocab_list)
+
         return self.col.aggregate(
             [
                 {"$match": {"vocab_id": {"$in": vocab_list}}},
@@ -234,73 +792,277 @@ class Vocabulary(Mongo):
         )
 
 
+class Counter(Mongo):
+    """
+    A class for allocating sequential IDs from the 'counters' collection.
+
+    Every sequence is a single document whose 'seq' field holds the last allocated ID. IDs are
+    handed out with an atomic findAndModify, so they are unique across all bot processes.
+
+    Methods:
+        __init__(self): Initializes the Counter class and establishes a connection to the 'counters' collection.
+        next(self, name, block=1): Allocates the next block of IDs of a sequence.
+        seed(self, name, value): Raises a sequence to at least the given value.
+    """
+
+    def __init__(self):
+        """
+        Initializes the Counter class and establishes a connection to the 'counters' collection.
+        """
+        super().__init__()
+        self.col = self.db.counters
+
+    def next(self, name, block=1):
+        """
+        Allocates the next block of IDs of a sequence.
+
+        Args:
+            name (str): The name of the sequence.
+            block (int, optional): The number of consecutive IDs to allocate.
+
+        Returns:
+            int: The first ID of the allocated block.
+        """
+        doc = self.col.find_one_and_update(
+            {"_id": name},
+            {"$inc": {"seq": block}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+
+        return doc["seq"] - block + 1
+
+    def seed(self, name, value):
+        """
+        Raises a sequence to at least the given value, e.g. to continue after existing IDs.
+
+        Args:
+            name (str): The name of the sequence.
+            value (int): The last ID that is already in use.
+
+        Returns:
+            None
+        """
+        self.col.update_one(
+            {"_id": name}, {"$max": {"seq": value}}, upsert=True
+        )
+
+
 class Practice(Mongo):
     """
-    This class represents a collection of methods for interacting with the 'practice' collection in the database.
+    This class represents a collection of methods for interacting with the practice history in the database.
     It provides functions for finding, updating, inserting, and checking for the existence of practice records.
 
+    Practice records are stored in buckets in the 'practice_buckets' collection, one document per user and
+    month. Each bucket holds the sessions of that month with the vocabularies and the number of attempts as
+    parallel arrays, so a lookup reads a single small document through a single index entry.
+
     Methods:
-        __init__(self): Initializes the Practice class and establishes a connection to the 'practice' collection in the database.
-        max_id(self): Returns the maximum practice_id value from the 'practice' collection.
-        find(self, user_id, timestamp): Finds a practice record for the given user_id and timestamp.
+        __init__(self): Initializes the Practice class and establishes a connection to the 'practice_buckets' collection in the database.
+        ensure_indexes(self): Creates the indexes and seeds the practice_id sequence.
+        max_id(self): Returns the maximum practice_id value of all practice records.
+        next_id(self): Allocates a new practice_id.
+        find(self, user_id, timestamp, tz=None): Finds a practice record for the given user_id on the local day
+            of the timestamp.
         update(self, practice_id, update_dict): Updates a practice record with the given practice_id using the update_dict.
         insert(self, practice_id, user_id, timestamp, vocabs, attempts): Inserts a new practice record with the given practice_id,
             user_id, timestamp, vocabs, and attempts.
-        exists(self, user_id, timestamp, return_count=False): Checks if a practice record exists for the given user_id and timestamp.
+        exists(self, user_id, timestamp, return_count=False, tz=None): Checks if a practice record exists for the
+            given user_id on the local day of the timestamp.
             If return_count is set to True, returns the count of matching practice records.
     """
 
+    indexes = [
+        IndexModel(
+            [("user_id", ASCENDING), ("month", ASCENDING)], unique=True
+        ),
+        IndexModel([("max_practice_id", DESCENDING)]),
+        IndexModel([("sessions.practice_id", ASCENDING)]),
+    ]
+    id_block = int(os.environ.get("PRACTICE_ID_BLOCK", 1))
+    _ids = iter(())
+    _ids_lock = threading.Lock()
+
     def __init__(self):
         """
-        Initializes the Practice class and establishes a connection to the 'practice' collection in the database.
+        Initializes the Practice class and establishes a connection to the 'practice_buckets' collection in the database.
         """
         super().__init__()
-        self.col = self.db.practice
+        self.col = self.db.practice_buckets
+
+    def ensure_indexes(self):
+        """
+        Creates the indexes of the 'practice_buckets' collection and makes sure the practice_id sequence
+        continues after the highest existing practice_id.
+
+        Returns:
+            None
+        """
+        super().ensure_indexes()
+        Counter().seed("practice_id", self.max_id())
+
+    @staticmethod
+    def month(timestamp):
+        """
+        Returns the key of the bucket a timestamp belongs to.
+
+        Args:
+            timestamp (datetime): The timestamp.
+
+        Returns:
+            datetime: The first day of the month of the timestamp.
+        """
+        return dt(timestamp.year, timestamp.month, 1)
+
+    @staticmethod
+    def bucket_update(practice_id, user_id, timestamp, vocabs, attempts):
+        """
+        Returns the filter and the upsert update that add a practice record to its bucket.
+
+        Args:
+            practice_id (int): The practice_id of the new practice record.
+            user_id (int): The user_id of the new practice record.
+            timestamp (datetime): The timestamp of the new practice record.
+            vocabs (list): A list of vocabulary IDs for the new practice record.
+            attempts (dict): The number of attempts per vocabulary ID, keyed by the stringified vocabulary ID.
+
+        Returns:
+            Tuple[dict, dict]: The filter and the update.
+        """
+        return (
+            {"user_id": user_id, "month": Practice.month(timestamp)},
+            {
+                "$push": {
+                    "sessions": {
+                        "practice_id": practice_id,
+                        "timestamp": timestamp,
+                        "vocabs": vocabs,
+                        "attempts": [attempts.get(str(v), 0) for v in vocabs],
+                    }
+                },
+                "$inc": {"count": 1},
+                "$max": {"max_practice_id": practice_id},
+            },
+        )
+
+    @staticmethod
+    def unpack(user_id, session):
+        """
+        Converts a session of a bucket into a practice record.
+
+        Args:
+            user_id (int): The user_id of the bucket.
+            session (dict): The session.
+
+        Returns:
+            dict: The practice record with the attempts keyed by the stringified vocabulary ID.
+        """
+        return {
+            "practice_id": session["practice_id"],
+            "user_id": user_id,
+            "timestamp": session["timestamp"],
+            "vocabs": session["vocabs"],
+            "attempts": {
+                str(v): a
+                for v, a in zip(session["vocabs"], session["attempts"])
+            },
+        }
 
     def max_id(self):
         """
-        Returns the maximum practice_id value from the 'practice' collection.
+        Returns the maximum practice_id value of all practice records.
 
         Returns:
-            int: The maximum practice_id value from the 'practice' collection.
+            int: The maximum practice_id value of all practice records.
         """
         try:
-            return self.col.find_one(sort=[("practice_id", -1)])["practice_id"]
+            return self.col.find_one(sort=[("max_practice_id", -1)])[
+                "max_practice_id"
+            ]
         except (KeyError, TypeError):
             return -1
 
-    def find(self, user_id, timestamp):
+    def next_id(self):
         """
-        Finds a practice record for the given user_id and timestamp.
+        Allocates a new practice_id from the 'practice_id' sequence. With a PRACTICE_ID_BLOCK larger
+        than 1, each process reserves that many IDs at once and hands them out locally.
+
+        Returns:
+            int: A practice_id that no other session or process has been handed.
+        """
+        with Practice._ids_lock:
+            practice_id = next(Practice._ids, None)
+
+            if practice_id is None:
+                start = Counter().next("practice_id", block=self.id_block)
+                Practice._ids = iter(range(start, start + self.id_block))
+                practice_id = next(Practice._ids)
+
+        return practice_id
+
+    def sessions(self, user_id, timestamp, tz=None):
+        """
+        Returns the sessions of the given user_id on the local day of the given timestamp. The
+        day runs from local midnight to local midnight, which may span two monthly buckets.
 
         Args:
-            user_id (int): The user_id of the practice record to find.
-            timestamp (datetime): The timestamp of the practice record to find.
+            user_id (int): The user_id of the practice records.
+            timestamp (datetime): The naive UTC timestamp of the day.
+            tz (str, optional): The name of the timezone of the user.
 
         Returns:
-            dict: The practice record with the given user_id and timestamp.
+            list: The sessions of the day, in the order they were inserted.
         """
-        dt_start = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
-        dt_end = timestamp.replace(
-            hour=23, minute=59, second=59, microsecond=0
+        dt_start = day_start(tz, timestamp)
+        dt_end = day_start(tz, timestamp, days=1)
+        months = sorted(
+            {self.month(dt_start), self.month(dt_end - td(microseconds=1))}
         )
 
-        return self.col.find_one(
-            {
-                "user_id": user_id,
-                "timestamp": {"$gte": dt_start, "$lte": dt_end},
-            }
-        )
+        buckets = self.col.find(
+            {"user_id": user_id, "month": {"$in": months}},
+            {"_id": 0, "sessions": 1},
+        ).sort("month", ASCENDING)
+
+        return [
+            session
+            for bucket in buckets
+            for session in bucket.get("sessions", [])
+            if dt_start <= session["timestamp"] < dt_end
+        ]
+
+    def find(self, user_id, timestamp, tz=None):
+        """
+        Finds a practice record for the given user_id on the local day of the timestamp.
+
+        Args:
+            user_id (int): The user_id of the practice record to find.
+            timestamp (datetime): The naive UTC timestamp of the day.
+            tz (str, optional): The name of the timezone of the user.
+
+        Returns:
+            dict: The first practice record of the user on that day, None if there is none.
+        """
+        sessions = self.sessions(user_id, timestamp, tz=tz)
+
+        return self.unpack(user_id, sessions[0]) if sessions else None
 
     def update(self, practice_id, update_dict):
         """
-        Updates a practice record with the given practice_id using the update_dict.
+        Updates a practice record with the given practice_id using the update_dict. The fields
+        of the update_dict refer to the fields of the session, e.g. {"$set": {"timestamp": ...}}.
 
         Args:
             practice_id (int): The practice_id of the practice record to update.
             update_dict (dict): A dictionary containing the updates to make to the practice record.
         """
-        self.col.update_one({"practice_id": practice_id}, update_dict)
+        self.col.update_one(
+            {"sessions.practice_id": practice_id},
+            {
+                operator: {f"sessions.$.{k}": v for k, v in fields.items()}
+                for operator, fields in update_dict.items()
+            },
+        )
 
     def insert(self, practice_id, user_id, timestamp, vocabs, attempts):
         """
@@ -311,56 +1073,33 @@ class Practice(Mongo):
         user_id (int): The user_id of the new practice record.
         timestamp (datetime): The timestamp of the new practice record.
         vocabs (list): A list of vocabulary words for the new practice record.
-        attempts (int): The number of attempts for the new practice record.
+        attempts (dict): The number of attempts per vocabulary, keyed by the stringified vocabulary ID.
         """
-        self.col.insert_one(
-            {
-                "practice_id": practice_id,
-                "user_id": user_id,
-                "timestamp": timestamp,
-                "vocabs": vocabs,
-                "attempts": attempts,
-            }
+        self.col.update_one(
+            *self.bucket_update(
+                practice_id, user_id, timestamp, vocabs, attempts
+            ),
+            upsert=True,
         )
 
-    def exists(self, user_id, timestamp, return_count=False):
+    def exists(self, user_id, timestamp, return_count=False, tz=None):
         """
-        Checks if a practice record exists for the given user_id and timestamp.
+        Checks if a practice record exists for the given user_id on the local day of the timestamp.
         If return_count is set to True, returns the count of matching practice records.
 
         Args:
             user_id (int): The user_id to check for in the practice records.
-            timestamp (datetime): The timestamp to check for in the practice records.
+            timestamp (datetime): The naive UTC timestamp of the day.
             return_count (bool): Whether to return the count of matching practice records.
+            tz (str, optional): The name of the timezone of the user.
 
         Returns:
             bool: True if a practice record exists for the given user_id and timestamp, False otherwise.
             int: The count of matching practice records if return_count is set to True.
         """
-        dt_start = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
-        dt_end = timestamp.replace(
-            hour=23, minute=59, second=59, microsecond=0
-        )
+        count = len(self.sessions(user_id, timestamp, tz=tz))
 
-        if not return_count:
-            return (
-                True
-                if self.col.count_documents(
-                    {
-                        "user_id": user_id,
-                        "timestamp": {"$gte": dt_start, "$lte": dt_end},
-                    }
-                )
-                > 0
-                else False
-            )
-        else:
-            return self.col.count_documents(
-                {
-                    "user_id": user_id,
-                    "timestamp": {"$gte": dt_start, "$lte": dt_end},
-                }
-            )
+        return count if return_count else count > 0
 
 
 class SRS(Mongo):
@@ -370,8 +1109,28 @@ class SRS(Mongo):
     Attributes:
         db (MongoClient): A MongoClient object for interacting with the database.
         col (Collection): A Collection object for interacting with the 'srs' collection.
+        indexes (List[IndexModel]): A unique index on user_id and vocab_id and a partial index over
+            the items that haven't graduated yet, which serves the due queue of SRS.repeat.
+
+    Items that reach level 5 are flagged as 'graduated'. They stay in the collection, so the
+    complete history is still available, but drop out of the due queue index.
     """
 
+    indexes = [
+        IndexModel(
+            [("user_id", ASCENDING), ("vocab_id", ASCENDING)], unique=True
+        ),
+        IndexModel(
+            [
+                ("user_id", ASCENDING),
+                ("quick_repeat", DESCENDING),
+                ("next_learn", ASCENDING),
+            ],
+            name="due_queue",
+            partialFilterExpression={"graduated": False},
+        ),
+    ]
+
     def __init__(self):
         """
         Initializes the SRS object and sets the 'srs' collection as an attribute.
@@ -381,39 +1140,176 @@ class SRS(Mongo):
         """
         super().__init__()
         self.col = self.db.srs
+        self.vocabulary = Vocabulary()
+
+    def ensure_indexes(self):
+        """
+        Creates the indexes of the 'srs' collection and drops the former full index on
+        user_id, quick_repeat and next_learn, which the partial due queue index replaces.
 
-    def repeat(self, user_id, timestamp, max_vocabs=None):
+        Returns:
+            None
+        """
+        if (
+            "user_id_1_quick_repeat_-1_next_learn_1"
+            in self.col.index_information()
+        ):
+            self.col.drop_index("user_id_1_quick_repeat_-1_next_learn_1")
+
+        super().ensure_indexes()
+
+    def repeat(self, user_id, timestamp, max_vocabs=None, fields=None):
         """
         Retrieves a list of vocabularies that are ready for repetition for a given user.
+        Sort, limit and projection are pushed down to the server, so the index on user_id,
+        quick_repeat and next_learn is walked in order and the scan stops after max_vocabs items.
 
         Args:
             user_id (int): The ID of the user.
-            timestamp (int): A Unix timestamp used for filter on next_learn.
+            timestamp (datetime): Items with a next_learn up to this naive UTC time are due,
+                usually the local midnight of the user, see day_start.
             max_vocabs (int, optional): The maximum number of vocabularies to retrieve.
                 If not provided, all ready vocabularies are retrieved.
+            fields (List[str], optional): The fields to retrieve. If not provided,
+                all fields are retrieved.
 
         Returns:
             list: A list of dictionaries, each representing a vocabulary that is ready for repetition.
         """
-        vocabs = list(
-            self.col.aggregate(
-                [
-                    {
-                        "$match": {
-                            "user_id": user_id,
+        projection = {"_id": 0}
+        if fields:
+            projection.update({field: 1 for field in fields})
+
+        cursor = self.col.find(
+            {
+                "user_id": user_id,
+                "graduated": False,
+                "next_learn": {"$lte": timestamp},
+            },
+            projection,
+        ).sort([("quick_repeat", -1), ("next_learn", 1)])
+        if max_vocabs:
+            cursor = cursor.limit(max_vocabs)
+
+        return list(cursor)
+
+    def due_count(self, user_id, timestamp):
+        """
+        Counts the vocabularies that are ready for repetition for a given user.
+
+        Args:
+            user_id (int): The ID of the user.
+            timestamp (datetime): A timestamp used for filter on next_learn.
+
+        Returns:
+            int: The number of vocabularies that are ready for repetition.
+        """
+        return self.col.count_documents(
+            {
+                "user_id": user_id,
+                "graduated": False,
+                "next_learn": {"$lte": timestamp},
+            }
+        )
+
+    def due_counts(self, groups):
+        """
+        Counts the vocabularies that are ready for repetition for many users with a single
+        aggregation. Users are grouped by their cutoff, e.g. the local midnight of their
+        timezone, and every group is matched on the due queue index.
+
+        Args:
+            groups (List[Tuple[List[int], datetime]]): The user IDs and the next_learn cutoff
+                of every group.
+
+        Returns:
+            Dict[int, int]: The number of ready vocabularies per user ID. Users without ready
+                vocabularies are missing.
+        """
+        if not groups:
+            return {}
+
+        pipeline = [
+            {
+                "$match": {
+                    "$or": [
+                        {
+                            "user_id": {"$in": user_ids},
+                            "graduated": False,
                             "next_learn": {"$lte": timestamp},
                         }
-                    },
-                    {"$sort": {"quick_repeat": -1, "next_learn": 1}},
-                    {"$project": {"_id": 0}},
-                ]
+                        for user_ids, timestamp in groups
+                    ]
+                }
+            },
+            {"$group": {"_id": "$user_id", "due": {"$sum": 1}}},
+        ]
+
+        return {doc["_id"]: doc["due"] for doc in self.col.aggregate(pipeline)}
+
+    def deck(
+        self,
+        user_id,
+        timestamp,
+        n_words,
+        max_vocabs=None,
+        learned=(),
+        frontier=0,
+    ):
+        """
+        Builds the deck of a user for a day: the vocabularies due for repetition, topped up
+        with new vocabularies the user hasn't learned yet. The due items come from a single
+        indexed query, the new vocabularies are picked after the user's frontier with the learned
+        bitset from the user document, and the vocabulary documents are joined from the
+        in-memory vocabulary store once it is loaded.
+
+        Args:
+            user_id (int): The ID of the user.
+            timestamp (datetime): Items with a next_learn up to this timestamp are due.
+            n_words (int): The number of vocabularies the user wants to learn per day.
+            max_vocabs (int, optional): The maximum number of vocabularies in the deck.
+            learned (Container[int], optional): The vocabulary IDs the user has learned.
+            frontier (int, optional): The user's frontier in frequency order.
+
+        Returns:
+            Tuple[list, int]: A list of vocabulary documents, due vocabularies first, and the
+                new frontier of the user.
+        """
+        if max_vocabs:
+            n_words = min(n_words, max_vocabs)
+
+        due = self.repeat(
+            user_id, timestamp, max_vocabs=max_vocabs, fields=["vocab_id"]
+        )
+        vocabs = list(
+            self.vocabulary.from_vocab_list(
+                vocab_list=[x["vocab_id"] for x in due]
             )
         )
+        if len(vocabs) < n_words:
+            fresh, frontier = self.vocabulary.fresh(
+                n_words - len(vocabs), learned, frontier=frontier
+            )
+            vocabs += fresh
 
-        if max_vocabs:
-            vocabs = vocabs[:max_vocabs]
+        return vocabs, frontier
+
+    def vocab_ids(self, user_id):
+        """
+        Retrieves the IDs of all vocabularies in the 'srs' collection for a given user.
 
-        return vocabs
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            list: A list of vocabulary IDs.
+        """
+        return [
+            x["vocab_id"]
+            for x in self.col.find(
+                {"user_id": user_id}, {"_id": 0, "vocab_id": 1}
+            )
+        ]
 
     def find(self, user_id, vocab_id):
         """
@@ -430,6 +1326,49 @@ class SRS(Mongo):
             {"user_id": user_id, "vocab_id": vocab_id}, {"_id": 0}
         )
 
+    def find_many(self, user_id, vocab_ids):
+        """
+        Finds several vocabularies in the 'srs' collection for a given user with a single query.
+
+        Args:
+            user_id (int): The ID of the user.
+            vocab_ids (List[int]): The IDs of the vocabularies.
+
+        Returns:
+            list: A list of dictionaries representing the vocabularies.
+        """
+        return list(
+            self.col.find(
+                {"user_id": user_id, "vocab_id": {"$in": vocab_ids}},
+                {"_id": 0},
+            )
+        )
+
+    def bulk_update(self, user_id, srs_items):
+        """
+        Writes several SRS items of a given user with a single unordered bulk write.
+
+        Args:
+            user_id (int): The ID of the user.
+            srs_items (List[dict]): The SRS items to write, each containing its vocab_id.
+
+        Returns:
+            None
+        """
+        if not srs_items:
+            return
+
+        self.col.bulk_write(
+            [
+                UpdateOne(
+                    {"user_id": user_id, "vocab_id": item["vocab_id"]},
+                    {"$set": item},
+                )
+                for item in srs_items
+            ],
+            ordered=False,
+        )
+
     def update(self, user_id, vocab_id, update_dict):
         """
         Updates a vocabulary in the 'srs' collection for a given user.
@@ -465,9 +1404,54 @@ class SRS(Mongo):
                 "last_learn": None,
                 "next_learn": None,
                 "quick_repeat": False,
+                "graduated": False,
             }
         )
 
+    def enroll(self, user_id, vocab_ids):
+        """
+        Inserts several vocabularies into the 'srs' collection for a given user with a single
+        unordered bulk upsert. Vocabularies the user already has are left untouched, so calling
+        this repeatedly or concurrently for the same vocabularies is safe.
+
+        Args:
+            user_id (int): The ID of the user.
+            vocab_ids (List[int]): The IDs of the vocabularies.
+
+        Returns:
+            None
+        """
+        if not vocab_ids:
+            return
+
+        try:
+            self.col.bulk_write(
+                [
+                    UpdateOne(
+                        {"user_id": user_id, "vocab_id": vocab_id},
+                        {
+                            "$setOnInsert": {
+                                "level": 1,
+                                "last_learn": None,
+                                "next_learn": None,
+                                "quick_repeat": False,
+                                "graduated": False,
+                            }
+                        },
+                        upsert=True,
+                    )
+                    for vocab_id in vocab_ids
+                ],
+                ordered=False,
+            )
+        except BulkWriteError as e:
+            # Concurrent upserts of the same item race on the unique index, the loser
+            # fails with a duplicate key error although the item exists as intended.
+            if any(
+                error["code"] != 11000 for error in e.details["writeErrors"]
+            ):
+                raise
+
     def exists(self, user_id, vocab_id):
         """
         Checks if a vocabulary exists in the 'srs' collection for a given user.
@@ -487,3 +1471,300 @@ class SRS(Mongo):
             > 0
             else False
         )
+
+
+class ReminderJournal(Mongo):
+    """
+    A class for the delivery journal of the reminders in the 'reminder_journal' collection.
+
+    Every reminder is claimed before it is sent, with the key '<user_id>:<date>:<slot>' as the
+    document ID, so of several reminder processes only one can claim a reminder. A claim is
+    'pending' until the reminder is sent and carries a lease. Pending claims whose lease ran out,
+    e.g. because the process that claimed them died, can be reclaimed. The last processed
+    minute is kept in the 'reminder_state' collection so missed minutes can be caught up.
+
+    Attributes:
+        col (Collection): A collection object for interacting with the 'reminder_journal' collection.
+        state (Collection): A collection object for interacting with the 'reminder_state' collection.
+        indexes (List[IndexModel]): An index on (state, lease_until) and a TTL index on created.
+
+    Methods:
+        __init__(self): Initializes the ReminderJournal class and establishes a connection to the MongoDB server.
+        key(user_id, local): Returns the journal key of a reminder.
+        claim(self, claims, owner, lease): Claims reminders that have not been claimed before.
+        reclaim(self, owner, lease, since): Claims pending reminders whose lease ran out.
+        sent(self, key): Marks a reminder as sent.
+        failed(self, key): Marks a reminder as failed.
+        last_tick(self): Returns the last processed minute.
+        advance(self, tick): Records a processed minute.
+    """
+
+    indexes = [
+        IndexModel([("state", ASCENDING), ("lease_until", ASCENDING)]),
+        IndexModel(
+            [("created", ASCENDING)],
+            expireAfterSeconds=int(
+                os.environ.get("REMINDER_JOURNAL_TTL", 7 * 24 * 3600)
+            ),
+        ),
+    ]
+
+    def __init__(self):
+        """
+        Initializes the ReminderJournal class and establishes a connection to the MongoDB server.
+        """
+        super().__init__()
+        self.col = self.db.reminder_journal
+        self.state = self.db.reminder_state
+
+    @staticmethod
+    def key(user_id, local):
+        """
+        Returns the journal key of a reminder.
+
+        Args:
+            user_id (int): The ID of the user.
+            local (datetime): The local time of the reminder.
+
+        Returns:
+            str: The key '<user_id>:<YYYY-MM-DD>:<HH:MM>'.
+        """
+        return f"{user_id}:{local:%Y-%m-%d}:{local:%H:%M}"
+
+    def claim(self, claims, owner, lease):
+        """
+        Claims reminders that have not been claimed before. All claims are inserted with one
+        unordered bulk write and the unique document ID rejects those that already exist.
+
+        Args:
+            claims (List[Dict]): The claims with the fields _id, user_id, name, tick
+                and due.
+            owner (str): The name of the claiming process.
+            lease (int): The number of seconds until a pending claim may be reclaimed.
+
+        Returns:
+            List[Dict]: The claims that were inserted.
+        """
+        if not claims:
+            return []
+
+        now = dt.utcnow()
+        docs = [
+            {
+                **claim,
+                "state": "pending",
+                "owner": owner,
+                "lease_until": now + td(seconds=lease),
+                "created": now,
+            }
+            for claim in claims
+        ]
+        try:
+            self.col.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            if any(err["code"] != 11000 for err in e.details["writeErrors"]):
+                raise
+            rejected = {err["index"] for err in e.details["writeErrors"]}
+            docs = [doc for i, doc in enumerate(docs) if i not in rejected]
+
+        return docs
+
+    def reclaim(self, owner, lease, since):
+        """
+        Claims pending reminders whose lease ran out, one at a time with an atomic
+        findAndModify, so a stale claim is taken over by exactly one process.
+
+        Args:
+            owner (str): The name of the claiming process.
+            lease (int): The number of seconds until the claims may be reclaimed again.
+            since (datetime): The earliest tick whose reminders are still worth sending.
+
+        Returns:
+            List[Dict]: The reclaimed claims.
+        """
+        now = dt.utcnow()
+        claims = []
+        while True:
+            doc = self.col.find_one_and_update(
+                {
+                    "state": "pending",
+                    "lease_until": {"$lt": now},
+                    "tick": {"$gte": since},
+                },
+                {
+                    "$set": {
+                        "owner": owner,
+                        "lease_until": now + td(seconds=lease),
+                    }
+                },
+                return_document=ReturnDocument.AFTER,
+            )
+            if doc is None:
+                return claims
+            claims.append(doc)
+
+    def sent(self, key):
+        """
+        Marks a reminder as sent.
+
+        Args:
+            key (str): The journal key of the reminder.
+
+        Returns:
+            None
+        """
+        self.col.update_one(
+            {"_id": key},
+            {"$set": {"state": "sent"}, "$unset": {"lease_until": ""}},
+        )
+
+    def failed(self, key):
+        """
+        Marks a reminder as failed, so it is not reclaimed.
+
+        Args:
+            key (str): The journal key of the reminder.
+
+        Returns:
+            None
+        """
+        self.col.update_one(
+            {"_id": key},
+            {"$set": {"state": "failed"}, "$unset": {"lease_until": ""}},
+        )
+
+    def last_tick(self):
+        """
+        Returns the last processed minute.
+
+        Returns:
+            datetime: The last processed minute in UTC, None if no minute was processed yet.
+        """
+        doc = self.state.find_one({"_id": "last_tick"})
+
+        return None if doc is None else doc["tick"]
+
+    def advance(self, tick):
+        """
+        Records a processed minute. The last processed minute only ever moves forward.
+
+        Args:
+            tick (datetime): The processed minute in UTC.
+
+        Returns:
+            None
+        """
+        self.state.update_one(
+            {"_id": "last_tick"}, {"$max": {"tick": tick}}, upsert=True
+        )
+
+
+def ensure_indexes():
+    """
+    Creates the indexes of the 'user', 'vocabulary', 'practice', 'srs' and 'reminder_journal'
+    collections. Idempotent, meant to run on every startup of the bots.
+
+    Returns:
+        None
+    """
+    for dao in (User, Vocabulary, Practice, SRS, ReminderJournal):
+        dao().ensure_indexes()
+
+
+def find_collscan(plan):
+    """
+    Searches an explain document for a COLLSCAN stage.
+
+    Args:
+        plan (dict | list): The explain output or a part of it.
+
+    Returns:
+        bool: True if any stage of the plan is a collection scan, False otherwise.
+    """
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(find_collscan(v) for v in plan.values())
+    elif isinstance(plan, list):
+        return any(find_collscan(v) for v in plan)
+
+    return False
+
+
+def check_query_plans():
+    """
+    Explains the hot queries of the DAOs and raises if any of them falls back to a
+    collection scan, e.g. because an index is missing or no longer matches the query.
+
+    Returns:
+        None
+
+    Raises:
+        QueryPlanError: If the winning plan of a hot query contains a COLLSCAN stage.
+    """
+    user, vocabulary, practice, srs = User(), Vocabulary(), Practice(), SRS()
+    journal = ReminderJournal()
+    now = dt.now()
+    queries = {
+        "User.find": user.col.find({"user_id": 0}),
+        "User.due_at": user.due_at([480, 481]),
+        "User.rebucket": user.col.find(
+            {"tz": DEFAULT_TIMEZONE, "utc_offset": {"$ne": 60}}
+        ),
+        "Vocabulary.find": vocabulary.col.find({"vocab_id": 0}),
+        "Vocabulary.from_vocab_list": vocabulary.col.find(
+            {"vocab_id": {"$in": [0, 1]}}
+        ),
+        "Vocabulary.range": vocabulary.col.find(
+            {"abbr": "v", "rank": {"$gte": 0, "$lt": 20}}
+        ).sort([("abbr", 1), ("rank", 1)]),
+        "Vocabulary.fresh": vocabulary.col.find(
+            {"rank_all": {"$gte": 0}}
+        ).sort("rank_all", 1),
+        "Practice.max_id": practice.col.find()
+        .sort("max_practice_id", -1)
+        .limit(1),
+        "Practice.find": practice.col.find(
+            {"user_id": 0, "month": {"$in": [practice.month(now)]}}
+        ).sort("month", ASCENDING),
+        "Practice.update": practice.col.find({"sessions.practice_id": 0}),
+        "SRS.find": srs.col.find({"user_id": 0, "vocab_id": 0}),
+        "SRS.repeat": srs.col.find(
+            {"user_id": 0, "graduated": False, "next_learn": {"$lte": now}},
+            {"_id": 0, "vocab_id": 1},
+        )
+        .sort([("quick_repeat", -1), ("next_learn", 1)])
+        .limit(30),
+        "SRS.due_count": srs.col.find(
+            {"user_id": 0, "graduated": False, "next_learn": {"$lte": now}}
+        ),
+        "SRS.due_counts": srs.col.find(
+            {
+                "$or": [
+                    {
+                        "user_id": {"$in": [0, 1]},
+                        "graduated": False,
+                        "next_learn": {"$lte": now},
+                    }
+                ]
+            }
+        ),
+        "ReminderJournal.reclaim": journal.col.find(
+            {
+                "state": "pending",
+                "lease_until": {"$lt": now},
+                "tick": {"$gte": now},
+            }
+        ),
+    }
+
+    collscans = [
+        name
+        for name, cursor in queries.items()
+        if find_collscan(cursor.explain()["queryPlanner"]["winningPlan"])
+    ]
+
+    if collscans:
+        raise QueryPlanError(
+            f"Collection scan in query plan of: {', '.join(collscans)}"
+        )
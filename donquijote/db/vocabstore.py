@@ -0,0 +1,179 @@
+import random
+from array import array
+
+
+class VocabularyStore:
+    """
+    An immutable in-memory copy of the vocabulary collection.
+
+    The vocabulary is a static list of a few thousand documents, so it is loaded once and
+    answered from memory afterwards. Documents are kept in frequency order, vocabulary IDs
+    map to their position in a dict, and every abbreviation has an array of positions in
+    frequency order.
+
+    Attributes:
+        docs (Tuple[Dict]): All vocabulary documents sorted by frequency.
+        positions (Dict[int, int]): Maps a vocabulary ID to its position in docs.
+        abbrs (Dict[str, array]): Maps an abbreviation to the positions of its documents in docs.
+
+    Methods:
+        find(self, vocab_id): Retrieves a single vocabulary document.
+        from_vocab_list(self, vocab_list): Retrieves the vocabulary documents with the specified IDs.
+        range(self, start, end, abbr=None): Retrieves vocabulary documents within a frequency range.
+        vocab_count(self, abbr): Retrieves the number of vocabulary documents with an abbreviation.
+        sample(self, n_words, exclude=()): Retrieves a random sample of vocabulary documents.
+        fresh(self, n_words, learned, frontier=0, window=50): Retrieves unlearned vocabulary documents
+            from the front of the frequency order.
+    """
+
+    def __init__(self, docs):
+        """
+        Initializes the store from an iterable of vocabulary documents.
+
+        Args:
+            docs (Iterable[Dict]): The vocabulary documents.
+
+        Returns:
+            None
+        """
+        self.docs = tuple(
+            sorted(docs, key=lambda d: (d["freq"], d["vocab_id"]))
+        )
+        self.positions = {d["vocab_id"]: i for i, d in enumerate(self.docs)}
+
+        abbrs = {}
+        for i, d in enumerate(self.docs):
+            abbrs.setdefault(d["abbr"], array("i")).append(i)
+        self.abbrs = abbrs
+
+    def __len__(self):
+        return len(self.docs)
+
+    def find(self, vocab_id):
+        """
+        Retrieves a single vocabulary document with the specified vocabulary ID.
+
+        Args:
+            vocab_id (int): The vocabulary ID of the vocabulary document to retrieve.
+
+        Returns:
+            Dict: A copy of the vocabulary document, None if the ID is unknown.
+        """
+        i = self.positions.get(vocab_id)
+
+        return None if i is None else dict(self.docs[i])
+
+    def from_vocab_list(self, vocab_list):
+        """
+        Retrieves a list of vocabulary documents with the specified vocabulary IDs.
+
+        Args:
+            vocab_list (List[int]): A list of vocabulary IDs.
+
+        Returns:
+            List[Dict]: Copies of the vocabulary documents in the order of vocab_list. Unknown IDs are skipped.
+        """
+        return [
+            dict(self.docs[self.positions[vocab_id]])
+            for vocab_id in vocab_list
+            if vocab_id in self.positions
+        ]
+
+    def range(self, start, end, abbr=None):
+        """
+        Retrieves a list of vocabulary documents within a specified range, sorted by frequency.
+
+        Args:
+            start (int): The starting index of the range.
+            end (int): The ending index of the range.
+            abbr (str, optional): The abbreviation of the vocabulary documents to retrieve. If not provided,
+                retrieves vocabulary documents of all abbreviations.
+
+        Returns:
+            List[Dict]: Copies of the vocabulary documents within the specified range.
+        """
+        if abbr:
+            return [
+                dict(self.docs[i]) for i in self.abbrs.get(abbr, ())[start:end]
+            ]
+
+        return [dict(d) for d in self.docs[start:end]]
+
+    def vocab_count(self, abbr):
+        """
+        Retrieves the number of vocabulary documents with the specified abbreviation.
+
+        Args:
+            abbr (str): The abbreviation of the vocabulary documents to count.
+
+        Returns:
+            int: The number of vocabulary documents with the specified abbreviation.
+        """
+        return len(self.abbrs.get(abbr, ()))
+
+    def sample(self, n_words, exclude=()):
+        """
+        Retrieves a random sample of vocabulary documents, excluding the specified vocabulary IDs.
+
+        Draws random positions and rejects excluded or already drawn ones, which takes O(n_words)
+        draws as long as most of the vocabulary is not excluded. If too many draws are rejected
+        the remaining candidates are enumerated instead.
+
+        Args:
+            n_words (int): The number of vocabulary documents to retrieve.
+            exclude (Container[int], optional): Vocabulary IDs to exclude from the sample. Should
+                support O(1) membership tests, e.g. a set.
+
+        Returns:
+            List[Dict]: Copies of the sampled vocabulary documents.
+        """
+        if not self.docs:
+            return []
+
+        picked = {}
+        draws = 0
+        while len(picked) < n_words and draws < 4 * n_words + 32:
+            draws += 1
+            i = random.randrange(len(self.docs))
+            if self.docs[i]["vocab_id"] not in exclude:
+                picked[i] = None
+
+        if len(picked) < n_words:
+            candidates = [
+                i
+                for i, d in enumerate(self.docs)
+                if i not in picked and d["vocab_id"] not in exclude
+            ]
+            k = min(n_words - len(picked), len(candidates))
+            picked.update(dict.fromkeys(random.sample(candidates, k)))
+
+        return [dict(self.docs[i]) for i in picked]
+
+    def fresh(self, n_words, learned, frontier=0, window=50):
+        """
+        Retrieves vocabulary documents the user hasn't learned yet. Walks the frequency order
+        from the frontier, the position up to which every vocabulary has been learned, collects
+        the first 'window' unlearned vocabularies and samples from them. The cost depends on the
+        window, not on the number of learned vocabularies.
+
+        Args:
+            n_words (int): The number of vocabulary documents to retrieve.
+            learned (Container[int]): The vocabulary IDs the user has learned, e.g. a Bitset.
+            frontier (int, optional): The position in frequency order to start from.
+            window (int, optional): The number of unlearned vocabularies to sample from.
+
+        Returns:
+            Tuple[List[Dict], int]: Copies of the sampled vocabulary documents in frequency order
+                and the new frontier, i.e. the position of the first unlearned vocabulary.
+        """
+        candidates = []
+        for i in range(frontier, len(self.docs)):
+            if self.docs[i]["vocab_id"] not in learned:
+                candidates.append(i)
+                if len(candidates) >= max(window, n_words):
+                    break
+
+        picked = random.sample(candidates, min(n_words, len(candidates)))
+        frontier = candidates[0] if candidates else len(self.docs)
+
+        return [dict(self.docs[i]) for i in sorted(picked)], frontier
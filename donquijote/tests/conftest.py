@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from donquijote.db import mongodb
+
+# The DAOs are instantiated when the conversation modules are imported. The client connects
+# lazily, so these defaults only have to name a database.
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_DB", "donquijote")
+
+
+class Clock:
+    """A manually advanced clock. Sleeping advances it instead of waiting."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    """
+    Returns a manually advanced clock that starts at zero.
+
+    Returns:
+        Clock: The clock.
+    """
+    return Clock()
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """
+    Points every DAO at a fresh in-memory mongomock database.
+
+    Args:
+        monkeypatch (pytest.MonkeyPatch): Fixture to set the MongoDB environment variables, to
+            replace the MongoClient and to unload the vocabulary store.
+
+    Returns:
+        Database: The database the DAOs use.
+    """
+    mongomock = pytest.importorskip("mongomock")
+    monkeypatch.setenv("MONGO_URI", "mongodb://localhost:27017")
+    monkeypatch.setenv("MONGO_DB", "donquijote")
+    monkeypatch.setattr(
+        mongodb, "MongoClient", lambda uri, **kwargs: mongomock.MongoClient()
+    )
+    monkeypatch.setattr(mongodb.Vocabulary, "store", None)
+    mongodb.close_clients()
+    mongodb.User.cache.clear()
+
+    yield mongodb.get_client()["donquijote"]
+
+    mongodb.close_clients()
+    mongodb.User.cache.clear()
@@ -0,0 +1,32 @@
+from donquijote.util.bitset import WORD_BITS, Bitset
+
+
+def test_bitset():
+    """
+    Tests membership, iteration and length of a Bitset restored from stored words.
+
+    Returns:
+        None
+    """
+    bitset = Bitset(Bitset.masks([0, 5, WORD_BITS - 1, WORD_BITS, 1000]))
+
+    assert 5 in bitset
+    assert 6 not in bitset
+    assert 1001 not in bitset
+    assert list(bitset) == [0, 5, WORD_BITS - 1, WORD_BITS, 1000]
+    assert len(bitset) == 5
+
+
+def test_bit_update():
+    """
+    Tests that 'bit_update' combines all integers of a word into a single $bit operand.
+
+    Returns:
+        None
+    """
+    update = Bitset.bit_update("learned", [1, 3, WORD_BITS + 2])
+
+    assert update == {
+        "learned.0": {"or": 0b1010},
+        "learned.1": {"or": 0b100},
+    }
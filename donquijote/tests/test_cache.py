@@ -0,0 +1,41 @@
+from donquijote.db.cache import ProfileCache
+
+
+def test_ttl(clock):
+    """
+    Tests that entries expire after the time to live and that hits and misses are counted.
+
+    Args:
+        clock (Clock): Fixture with a manually advanced clock.
+
+    Returns:
+        None
+    """
+    cache = ProfileCache(maxsize=10, ttl=60, clock=clock)
+    cache.set(1, {"name": "Sancho"})
+
+    assert cache.get(1) == {"name": "Sancho"}
+    clock.now = 61
+    assert cache.get(1) is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 0}
+
+
+def test_lru():
+    """
+    Tests that the least recently used entry is evicted when the cache is full.
+
+    Returns:
+        None
+    """
+    cache = ProfileCache(maxsize=2, ttl=60)
+    cache.set(1, "a")
+    cache.set(2, "b")
+    cache.get(1)
+    cache.set(3, "c")
+
+    assert cache.get(2) is None
+    assert cache.get(1) == "a"
+    assert cache.get(3) == "c"
+
+    cache.invalidate(3)
+    assert cache.get(3) is None
@@ -0,0 +1,335 @@
+import asyncio
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+import httpx
+import pytest
+
+TOKEN = "123:TEST"
+SECRET = "s3cret"
+
+
+class FakeTelegram(BaseHTTPRequestHandler):
+    """
+    A local stand-in for the Bot API that answers every method and records the messages the
+    bot sends.
+    """
+
+    sent = []
+
+    def do_POST(self):
+        method = self.path.rsplit("/", 1)[-1]
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        params = dict(parse_qsl(body.decode()))
+
+        result = True
+        if method == "getMe":
+            result = {
+                "id": 1,
+                "is_bot": True,
+                "first_name": "Don Quijote",
+                "username": "donquijote_test_bot",
+            }
+        elif method == "sendMessage":
+            self.sent.append((int(params["chat_id"]), params["text"]))
+            result = {
+                "message_id": len(self.sent),
+                "date": 0,
+                "chat": {"id": int(params["chat_id"]), "type": "private"},
+                "text": params["text"],
+            }
+
+        payload = json.dumps({"ok": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class Unregistered:
+    async def find(self, **kwargs):
+        return None
+
+
+@pytest.fixture
+def api():
+    FakeTelegram.sent = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTelegram)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/bot"
+    server.shutdown()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def command(update_id, chat_id, text):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Ana"},
+            "text": text,
+            "entities": [
+                {"type": "bot_command", "offset": 0, "length": len(text)}
+            ],
+        },
+    }
+
+
+def test_webhook(monkeypatch, api):
+    """
+    Tests the webhook mode end to end against a local fake Bot API: updates of several chats
+    are accepted by the webhook listener, processed concurrently and answered, and requests
+    without the secret token are rejected.
+
+    Args:
+        monkeypatch (pytest.MonkeyPatch): Fixture to set the MongoDB environment variables
+            and to replace the user DAO of /play.
+        api (str): Fixture that serves the fake Bot API and returns its base URL.
+
+    Returns:
+        None
+    """
+    monkeypatch.setenv("MONGO_URI", "mongodb://localhost:27017")
+    monkeypatch.setenv("MONGO_DB", "donquijote")
+    from donquijote.bot.conversationbot import build_application
+    from donquijote.conversations import play
+
+    monkeypatch.setattr(play, "user", Unregistered())
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/telegram"
+
+    async def run():
+        application = build_application(
+            token=TOKEN,
+            base_url=api,
+            concurrent_updates=4,
+        )
+        async with application:
+            await application.updater.start_webhook(
+                listen="127.0.0.1",
+                port=port,
+                url_path="telegram",
+                webhook_url=url,
+                secret_token=SECRET,
+            )
+            await application.start()
+            try:
+                async with httpx.AsyncClient() as client:
+                    rejected = await client.post(
+                        url, json=command(1, 7, "/play")
+                    )
+                    accepted = await asyncio.gather(
+                        *[
+                            client.post(
+                                url,
+                                json=command(i, chat_id, "/play"),
+                                headers={
+                                    "X-Telegram-Bot-Api-Secret-Token": SECRET
+                                },
+                            )
+                            for i, chat_id in enumerate([7, 8, 9], start=2)
+                        ]
+                    )
+
+                for _ in range(100):
+                    if len(FakeTelegram.sent) == 3:
+                        break
+                    await asyncio.sleep(0.05)
+            finally:
+                await application.updater.stop()
+                await application.stop()
+
+        return rejected, accepted
+
+    rejected, accepted = asyncio.run(run())
+
+    assert rejected.status_code == 403
+    assert [r.status_code for r in accepted] == [200, 200, 200]
+    assert sorted(chat_id for chat_id, _ in FakeTelegram.sent) == [7, 8, 9]
+    assert all("not registered" in text for _, text in FakeTelegram.sent)
+
+
+def test_chat_ordered_application(monkeypatch, api):
+    """
+    Tests that updates of different chats are processed concurrently, while the updates of a
+    chat are processed one after the other and in order.
+
+    Args:
+        monkeypatch (pytest.MonkeyPatch): Fixture to set the MongoDB environment variables.
+        api (str): Fixture that serves the fake Bot API and returns its base URL.
+
+    Returns:
+        None
+    """
+    monkeypatch.setenv("MONGO_URI", "mongodb://localhost:27017")
+    monkeypatch.setenv("MONGO_DB", "donquijote")
+    from telegram import Update
+    from telegram.ext import Application, TypeHandler
+
+    from donquijote.bot.conversationbot import ChatOrderedApplication
+
+    events = []
+
+    async def handler(update, context):
+        events.append(("start", update.update_id))
+        await asyncio.sleep(0.05 if update.update_id == 1 else 0)
+        events.append(("end", update.update_id))
+
+    async def run():
+        application = (
+            Application.builder()
+            .application_class(ChatOrderedApplication)
+            .token(TOKEN)
+            .base_url(api)
+            .concurrent_updates(4)
+            .build()
+        )
+        application.add_handler(TypeHandler(Update, handler))
+        async with application:
+            await asyncio.gather(
+                *[
+                    application.process_update(
+                        Update.de_json(
+                            command(i, chat_id, "/play"), application.bot
+                        )
+                    )
+                    for i, chat_id in [(1, 7), (2, 7), (3, 8)]
+                ]
+            )
+
+    asyncio.run(run())
+
+    assert events.index(("end", 1)) < events.index(("start", 2))
+    assert events.index(("end", 3)) < events.index(("end", 1))
+
+
+def test_busy_chat_does_not_starve_other_chats(monkeypatch, api):
+    """
+    Tests that updates waiting for their chat don't take the concurrent update slots: while
+    a chat's update is running and more of its updates are queued, the update of another
+    chat is still processed.
+
+    Args:
+        monkeypatch (pytest.MonkeyPatch): Fixture to set the MongoDB environment variables.
+        api (str): Fixture that serves the fake Bot API and returns its base URL.
+
+    Returns:
+        None
+    """
+    monkeypatch.setenv("MONGO_URI", "mongodb://localhost:27017")
+    monkeypatch.setenv("MONGO_DB", "donquijote")
+    from telegram import Update
+    from telegram.ext import Application, TypeHandler
+
+    from donquijote.bot.conversationbot import ChatOrderedApplication
+
+    processed = []
+    released = asyncio.Event()
+
+    async def handler(update, context):
+        if update.update_id == 1:
+            await released.wait()
+        if update.effective_chat.id == 8:
+            released.set()
+        processed.append(update.update_id)
+
+    async def run():
+        application = (
+            Application.builder()
+            .application_class(ChatOrderedApplication)
+            .token(TOKEN)
+            .base_url(api)
+            .updater(None)
+            .concurrent_updates(2)
+            .build()
+        )
+        application.add_handler(TypeHandler(Update, handler))
+        async with application:
+            await application.start()
+            try:
+                for i, chat_id in [(1, 7), (2, 7), (3, 7), (4, 8)]:
+                    await application.update_queue.put(
+                        Update.de_json(
+                            command(i, chat_id, "/play"), application.bot
+                        )
+                    )
+                await asyncio.wait_for(application.update_queue.join(), 5)
+            finally:
+                released.set()
+                await application.stop()
+
+    asyncio.run(run())
+
+    assert processed == [4, 1, 2, 3]
+
+
+@pytest.mark.parametrize(
+    "webhook_url, secret_token, missing",
+    [
+        (None, SECRET, "WEBHOOK_URL"),
+        ("https://example.org/telegram", "", "WEBHOOK_SECRET"),
+        (None, None, "WEBHOOK_URL and WEBHOOK_SECRET"),
+    ],
+)
+def test_check_webhook_options(
+    monkeypatch, webhook_url, secret_token, missing
+):
+    """
+    Tests that the webhook mode refuses to start without a webhook URL or secret token.
+
+    Args:
+        monkeypatch (pytest.MonkeyPatch): Fixture to set the MongoDB environment variables.
+        webhook_url (str): The configured webhook URL.
+        secret_token (str): The configured secret token.
+        missing (str): The expected names of the missing variables.
+
+    Returns:
+        None
+    """
+    monkeypatch.setenv("MONGO_URI", "mongodb://localhost:27017")
+    monkeypatch.setenv("MONGO_DB", "donquijote")
+    from donquijote.bot.conversationbot import check_webhook_options
+
+    options = {"webhook_url": webhook_url, "secret_token": secret_token}
+    with pytest.raises(ValueError, match=missing):
+        check_webhook_options(options)
+
+    check_webhook_options(
+        {"webhook_url": "https://example.org/telegram", "secret_token": SECRET}
+    )
+
+
+def test_rate_limiter_stats_job(monkeypatch):
+    """
+    Tests that the application logs the rate limiter stats periodically.
+
+    Args:
+        monkeypatch (pytest.MonkeyPatch): Fixture to set the MongoDB environment variables.
+
+    Returns:
+        None
+    """
+    monkeypatch.setenv("MONGO_URI", "mongodb://localhost:27017")
+    monkeypatch.setenv("MONGO_DB", "donquijote")
+    from donquijote.bot.conversationbot import build_application
+    from donquijote.conversations.helpers import log_rate_limiter_stats
+
+    application = build_application(token=TOKEN)
+
+    assert [job.callback for job in application.job_queue.jobs()] == [
+        log_rate_limiter_stats
+    ]
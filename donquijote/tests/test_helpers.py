@@ -0,0 +1,215 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from donquijote.conversations import helpers
+from donquijote.conversations.helpers import (
+    MAX_MESSAGE_LENGTH,
+    coalesce,
+    edit_message_text,
+    send,
+)
+from donquijote.util.ratelimit import RateLimiter
+
+
+@pytest.fixture(autouse=True)
+def unlimited(monkeypatch):
+    """
+    Lifts the rate limits, so the tests don't wait for tokens.
+
+    Args:
+        monkeypatch (pytest.MonkeyPatch): Fixture to replace the rate limiter.
+
+    Returns:
+        None
+    """
+    monkeypatch.setattr(
+        helpers,
+        "RATE_LIMITER",
+        RateLimiter(rate=1e6, chat_rate=1e6, chat_burst=1e6),
+    )
+
+
+class Chat:
+    """A fake chat that records the sent and edited messages."""
+
+    def __init__(self, chat_id=1):
+        self.sent = []
+        self.edits = []
+        self.update = SimpleNamespace(
+            message=SimpleNamespace(reply_text=self.reply_text),
+            effective_chat=SimpleNamespace(id=chat_id),
+        )
+        self.context = SimpleNamespace(
+            chat_data={}, bot=SimpleNamespace(edit_message_text=self.edit)
+        )
+
+    async def reply_text(self, text, reply_markup=None, **kwargs):
+        self.sent.append((text, reply_markup))
+        return SimpleNamespace(chat_id=1, message_id=len(self.sent), text=text)
+
+    async def edit(self, chat_id, message_id, text):
+        self.edits.append((message_id, text))
+
+
+def test_coalesce_merges_sends_in_order():
+    """
+    Tests that the texts sent in a coalesced handler are merged into as few messages as
+    possible in order and that a reply markup ends its message.
+
+    Returns:
+        None
+    """
+    chat = Chat()
+
+    @coalesce
+    async def handler(update, context):
+        await send(update, "a")
+        await send(update, "b", reply_markup="keyboard")
+        await send(update, "c")
+        return 0
+
+    assert asyncio.run(handler(chat.update, chat.context)) == 0
+    assert chat.sent == [("a\n\nb", "keyboard"), ("c", None)]
+
+
+def test_coalesce_splits_at_the_message_length_limit():
+    """
+    Tests that merged texts never exceed the message length limit.
+
+    Returns:
+        None
+    """
+    chat = Chat()
+    long = "x" * (MAX_MESSAGE_LENGTH - 2)
+
+    @coalesce
+    async def handler(update, context):
+        await send(update, long)
+        await send(update, "y")
+        await send(update, "z")
+
+    asyncio.run(handler(chat.update, chat.context))
+
+    assert [text for text, _ in chat.sent] == [long, "y\n\nz"]
+    assert all(len(text) <= MAX_MESSAGE_LENGTH for text, _ in chat.sent)
+
+
+def test_send_outside_a_handler_is_immediate():
+    """
+    Tests that a text sent outside a coalesced handler is sent right away.
+
+    Returns:
+        None
+    """
+    chat = Chat()
+
+    async def run():
+        pending = await send(chat.update, "a")
+        return await pending
+
+    message = asyncio.run(run())
+
+    assert chat.sent == [("a", None)]
+    assert message.message_id == 1
+
+
+def test_edit_keeps_the_merged_texts():
+    """
+    Tests that editing a text that was merged with others only replaces that text.
+
+    Returns:
+        None
+    """
+    chat = Chat()
+
+    @coalesce
+    async def handler(update, context):
+        context.chat_data["correction"] = await send(update, "wrong")
+        context.chat_data["new_message"] = "____"
+        await send(update, "next")
+
+    async def run():
+        await handler(chat.update, chat.context)
+        await edit_message_text(chat.context)
+
+    asyncio.run(run())
+
+    assert chat.sent == [("wrong\n\nnext", None)]
+    assert chat.edits == [(1, "____\n\nnext")]
+
+
+def test_failed_send_resolves_to_none(monkeypatch):
+    """
+    Tests that a text that couldn't be sent resolves to None and isn't edited.
+
+    Args:
+        monkeypatch (pytest.MonkeyPatch): Fixture to make reply_text fail and to silence
+            the logger.
+
+    Returns:
+        None
+    """
+    chat = Chat()
+
+    async def fail(*args, **kwargs):
+        raise RuntimeError("down")
+
+    monkeypatch.setattr(chat.update.message, "reply_text", fail)
+    monkeypatch.setattr(helpers.logger, "disabled", True)
+
+    @coalesce
+    async def handler(update, context):
+        context.chat_data["correction"] = await send(update, "a")
+
+    asyncio.run(handler(chat.update, chat.context))
+
+    assert chat.context.chat_data["correction"].message is None
+    assert asyncio.run(edit_message_text(chat.context)) is None
+
+
+def test_rate_limiter_stats_are_logged(caplog):
+    """
+    Tests that the periodic report logs the queue depth and the wait times of the rate
+    limiter.
+
+    Args:
+        caplog (pytest.LogCaptureFixture): Fixture to capture the log records.
+
+    Returns:
+        None
+    """
+    chat = Chat()
+    asyncio.run(send(chat.update, "a"))
+
+    with caplog.at_level("INFO", logger=helpers.logger.name):
+        asyncio.run(helpers.log_rate_limiter_stats(None))
+
+    assert "0 waiting, 1 sent" in caplog.text
+
+
+def test_unregistered_play_is_rate_limited(monkeypatch):
+    """
+    Tests that the reply to an unregistered user goes through the rate limiter like every
+    other reply.
+
+    Args:
+        monkeypatch (pytest.MonkeyPatch): Fixture to replace the user DAO of /play.
+
+    Returns:
+        None
+    """
+    from donquijote.conversations import play
+
+    class Unregistered:
+        async def find(self, **kwargs):
+            return None
+
+    monkeypatch.setattr(play, "user", Unregistered())
+    chat = Chat()
+    chat.update.message.from_user = {"id": 1}
+
+    assert asyncio.run(play.play(chat.update, chat.context)) == -1
+    assert "not registered" in chat.sent[0][0]
+    assert helpers.RATE_LIMITER.stats()["acquired"] == 1
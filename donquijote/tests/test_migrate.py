@@ -0,0 +1,160 @@
+from datetime import datetime as dt
+
+from pymongo import UpdateOne
+
+from donquijote.db.migrate import (
+    practice_buckets,
+    practiced_days,
+    srs_local_midnight,
+)
+from donquijote.db.mongodb import Counter, Practice
+from donquijote.util.bitset import Bitset
+from donquijote.util.timezone import day_ordinal, day_start
+
+
+def test_practice_buckets(mongo):
+    """
+    Tests that the 'practice_buckets' migration copies every session of the former 'practice'
+    collection into its monthly bucket exactly once, even when it runs again, and continues the
+    practice_id sequence after the copied sessions.
+
+    Args:
+        mongo (Database): Fixture with the in-memory database.
+
+    Returns:
+        None
+    """
+    mongo.practice.insert_many(
+        [
+            {
+                "practice_id": practice_id,
+                "user_id": 7,
+                "timestamp": timestamp,
+                "vocabs": [10],
+                "attempts": {"10": 1},
+            }
+            for practice_id, timestamp in [
+                (1, dt(2022, 3, 1, 8)),
+                (2, dt(2022, 3, 31, 23, 59)),
+                (3, dt(2022, 4, 1, 0, 0)),
+            ]
+        ]
+    )
+    Practice().ensure_indexes()
+
+    practice_buckets(mongo, batch_size=2)
+    practice_buckets(mongo, batch_size=2)
+
+    buckets = {
+        b["month"]: [s["practice_id"] for s in b["sessions"]]
+        for b in mongo.practice_buckets.find({"user_id": 7})
+    }
+    assert buckets == {dt(2022, 3, 1): [1, 2], dt(2022, 4, 1): [3]}
+    assert mongo.practice_buckets.count_documents({}) == 2
+    assert (
+        mongo.practice_buckets.find_one({"month": dt(2022, 3, 1)})["count"]
+        == 2
+    )
+    assert Counter().next("practice_id") == 4
+
+
+def test_srs_local_midnight(mongo):
+    """
+    Tests that the 'srs_local_midnight' migration moves the next_learn of items scheduled at
+    UTC midnight to the local midnight of their user, so they are due on the same local day,
+    and that running it again or on graduated items changes nothing.
+
+    Args:
+        mongo (Database): Fixture with the in-memory database.
+
+    Returns:
+        None
+    """
+    mongo.user.insert_many(
+        [
+            {"user_id": 7, "tz": "Europe/Berlin"},
+            {"user_id": 8, "tz": "UTC"},
+        ]
+    )
+    mongo.srs.insert_many(
+        [
+            {"user_id": 7, "vocab_id": 1, "next_learn": dt(2022, 3, 10)},
+            {"user_id": 7, "vocab_id": 2, "next_learn": dt(2022, 7, 10)},
+            {"user_id": 7, "vocab_id": 3, "next_learn": dt(2022, 3, 9, 23)},
+            {"user_id": 8, "vocab_id": 4, "next_learn": dt(2022, 3, 10)},
+            {"user_id": 9, "vocab_id": 5, "next_learn": dt(2022, 3, 10)},
+        ]
+    )
+    mongo.srs.update_many({}, {"$set": {"graduated": False}})
+    mongo.srs.insert_one(
+        {
+            "user_id": 7,
+            "vocab_id": 6,
+            "next_learn": dt(2099, 1, 1),
+            "graduated": True,
+        }
+    )
+
+    srs_local_midnight(mongo, batch_size=2)
+    srs_local_midnight(mongo, batch_size=2)
+
+    items = {i["vocab_id"]: i["next_learn"] for i in mongo.srs.find()}
+    assert items == {
+        1: dt(2022, 3, 9, 23),
+        2: dt(2022, 7, 9, 22),
+        3: dt(2022, 3, 9, 23),
+        4: dt(2022, 3, 10),
+        5: dt(2022, 3, 9, 23),
+        6: dt(2099, 1, 1),
+    }
+    assert items[1] <= day_start("Europe/Berlin", dt(2022, 3, 10, 8))
+
+
+def test_practiced_days(mongo, monkeypatch):
+    """
+    Tests that the 'practiced_days' migration records the local dates of the sessions, like
+    /play does, so a session shortly after local midnight counts for the new day. mongomock
+    doesn't implement $bit, so the updates are checked instead of applied.
+
+    Args:
+        mongo (Database): Fixture with the in-memory database.
+        monkeypatch (pytest.MonkeyPatch): Fixture to record the bulk writes.
+
+    Returns:
+        None
+    """
+    mongo.user.insert_one({"user_id": 7, "tz": "Europe/Berlin"})
+    for practice_id, timestamp in [
+        (1, dt(2022, 3, 8, 12)),
+        (2, dt(2022, 3, 9, 23, 30)),
+    ]:
+        bucket_filter, update = Practice.bucket_update(
+            practice_id=practice_id,
+            user_id=7,
+            timestamp=timestamp,
+            vocabs=[10],
+            attempts={"10": 1},
+        )
+        mongo.practice_buckets.update_one(bucket_filter, update, upsert=True)
+
+    writes = []
+    monkeypatch.setattr(
+        type(mongo.user),
+        "bulk_write",
+        lambda col, requests, ordered=True: writes.extend(requests),
+    )
+
+    practiced_days(mongo)
+
+    march_10 = day_ordinal("Europe/Berlin", dt(2022, 3, 10, 8))
+    assert writes == [
+        UpdateOne(
+            {"user_id": 7},
+            {
+                "$bit": Bitset.bit_update(
+                    "practiced_days", [march_10 - 2, march_10]
+                ),
+                "$max": {"last_practice_day": march_10},
+            },
+        )
+    ]
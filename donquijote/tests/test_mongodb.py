@@ -0,0 +1,541 @@
+import asyncio
+import threading
+from datetime import datetime as dt
+
+from donquijote.conversations.play import progress
+from donquijote.db.asyncmongodb import AsyncMongo
+from donquijote.db.mongodb import (
+    SRS,
+    Counter,
+    Practice,
+    ReminderJournal,
+    User,
+    Vocabulary,
+    close_clients,
+    find_collscan,
+    get_client,
+)
+from donquijote.util.bitset import Bitset
+
+
+def test_shared_client(monkeypatch):
+    """
+    Tests that 'get_client' hands out a single shared MongoClient per connection string.
+
+    Args:
+        monkeypatch (pytest.MonkeyPatch): Fixture to set the MONGO_URI environment variable.
+
+    Returns:
+        None
+    """
+    monkeypatch.setenv("MONGO_URI", "mongodb://localhost:27017")
+
+    try:
+        client = get_client()
+
+        assert get_client() is client
+        assert get_client("mongodb://localhost:27018") is not client
+    finally:
+        close_clients()
+
+
+def test_async_adapter():
+    """
+    Tests that 'AsyncMongo' exposes the methods of the wrapped DAO as coroutines and
+    passes through plain attributes.
+
+    Returns:
+        None
+    """
+
+    class Dummy:
+        def __init__(self):
+            self.col = "dummy"
+
+        def find(self, user_id):
+            return {"user_id": user_id, "thread": threading.get_ident()}
+
+    class AsyncDummy(AsyncMongo):
+        dao = Dummy
+
+    dummy = AsyncDummy()
+    result = asyncio.run(dummy.find(user_id=1))
+
+    assert dummy.col == "dummy"
+    assert result["user_id"] == 1
+    assert result["thread"] != threading.get_ident()
+
+
+def test_find_collscan():
+    """
+    Tests that 'find_collscan' detects collection scans anywhere in a winning plan.
+
+    Returns:
+        None
+    """
+    ixscan = {
+        "stage": "FETCH",
+        "inputStage": {"stage": "IXSCAN", "indexName": "user_id_1"},
+    }
+    collscan = {
+        "stage": "SORT",
+        "inputStage": {
+            "stage": "OR",
+            "inputStages": [ixscan, {"stage": "COLLSCAN"}],
+        },
+    }
+
+    assert not find_collscan(ixscan)
+    assert find_collscan(collscan)
+
+
+def test_practiced_on():
+    """
+    Tests that 'practiced_on' reads the practiced days from the user document.
+
+    Returns:
+        None
+    """
+    today = dt(2022, 3, 1).toordinal()
+    doc = {"practiced_days": Bitset.masks([today - 1, today])}
+
+    assert User.practiced_on(doc, today)
+    assert User.practiced_on(doc, today - 1)
+    assert not User.practiced_on(doc, today - 2)
+    assert not User.practiced_on({}, today)
+
+
+def test_reminder_journal_key():
+    """
+    Tests that the journal key identifies a reminder by user, local date and slot.
+
+    Returns:
+        None
+    """
+    assert ReminderJournal.key(7, dt(2022, 3, 1, 8, 5)) == "7:2022-03-01:08:05"
+
+
+def test_ensure_indexes_drops_duplicates(mongo):
+    """
+    Tests that duplicates left by racy inserts are moved aside before the unique indexes are
+    built, keeping the earliest document of every key.
+
+    Args:
+        mongo (Database): Fixture with the in-memory database.
+
+    Returns:
+        None
+    """
+    mongo.user.insert_many(
+        [{"user_id": 7, "name": "Ana"}, {"user_id": 7, "name": "Ana 2"}]
+    )
+    mongo.srs.insert_many(
+        [
+            {"user_id": 7, "vocab_id": 1, "level": 2},
+            {"user_id": 7, "vocab_id": 1, "level": 0},
+            {"user_id": 7, "vocab_id": 2, "level": 0},
+        ]
+    )
+
+    User().ensure_indexes()
+    SRS().ensure_indexes()
+
+    assert [u["name"] for u in mongo.user.find()] == ["Ana"]
+    assert [(i["vocab_id"], i["level"]) for i in mongo.srs.find()] == [
+        (1, 2),
+        (2, 0),
+    ]
+    assert mongo.user_duplicates.count_documents({}) == 1
+    assert mongo.srs_duplicates.count_documents({"level": 0}) == 1
+    assert mongo.user.index_information()["user_id_1"]["unique"]
+
+    mongo.user.insert_one({"user_id": 8, "name": "Bob"})
+    User().ensure_indexes()
+    assert mongo.user.count_documents({}) == 2
+
+
+def test_srs_enroll(mongo):
+    """
+    Tests that 'enroll' adds new vocabularies once and leaves the progress of vocabularies the
+    user already has untouched when it is called again.
+
+    Args:
+        mongo (Database): Fixture with the in-memory database.
+
+    Returns:
+        None
+    """
+    srs = SRS()
+    srs.ensure_indexes()
+
+    srs.enroll(7, [1, 2])
+    srs.update(7, 1, {"$set": {"level": 3}})
+    srs.enroll(7, [1, 2, 3])
+    srs.enroll(7, [])
+
+    items = {i["vocab_id"]: i for i in mongo.srs.find({"user_id": 7})}
+    assert sorted(items) == [1, 2, 3]
+    assert items[1]["level"] == 3
+    assert items[3]["level"] == 1
+    assert items[3]["next_learn"] is None
+    assert not items[3]["graduated"]
+
+
+def test_srs_bulk_update(mongo, monkeypatch):
+    """
+    Tests that the progress of all vocabularies of a session, including the graduated flag,
+    is written with a single bulk write and leaves the items of other users alone.
+
+    Args:
+        mongo (Database): Fixture with the in-memory database.
+        monkeypatch (pytest.MonkeyPatch): Fixture to count the bulk writes.
+
+    Returns:
+        None
+    """
+    mongo.srs.insert_many(
+        [
+            {
+                "user_id": user_id,
+                "vocab_id": vocab_id,
+                "level": level,
+                "last_learn": None,
+                "next_learn": dt(2022, 3, 1),
+                "quick_repeat": False,
+                "graduated": False,
+            }
+            for user_id, vocab_id, level in [
+                (7, 1, 4),
+                (7, 2, 2),
+                (7, 3, 0),
+                (8, 1, 4),
+            ]
+        ]
+    )
+    srs = SRS()
+    writes = []
+    bulk_write = type(srs.col).bulk_write
+
+    def counting_bulk_write(col, requests, **kwargs):
+        writes.append(len(requests))
+        return bulk_write(col, requests, **kwargs)
+
+    monkeypatch.setattr(type(srs.col), "bulk_write", counting_bulk_write)
+
+    attempts = {1: 1, 2: 3, 3: 1}
+    items = srs.find_many(7, [1, 2, 3])
+    srs.bulk_update(
+        7, [progress(item, attempts[item["vocab_id"]]) for item in items]
+    )
+
+    assert writes == [3]
+    stored = {
+        i["vocab_id"]: (i["level"], i["quick_repeat"], i["graduated"])
+        for i in mongo.srs.find({"user_id": 7})
+    }
+    assert stored == {
+        1: (5, False, True),
+        2: (1, True, False),
+        3: (1, False, False),
+    }
+    other = mongo.srs.find_one({"user_id": 8})
+    assert (other["level"], other["graduated"]) == (4, False)
+
+
+def test_srs_deck(mongo):
+    """
+    Tests that 'deck' puts the due vocabularies first, tops them up with new vocabularies in
+    frequency order up to n_words, and never returns more than max_vocabs.
+
+    Args:
+        mongo (Database): Fixture with the in-memory database.
+
+    Returns:
+        None
+    """
+    mongo.vocabulary.insert_many(
+        [
+            {"vocab_id": i, "freq": i, "abbr": "nm", "sp": f"sp{i}"}
+            for i in range(10)
+        ]
+    )
+    Vocabulary().ensure_indexes()
+    now = dt(2022, 3, 1)
+    mongo.srs.insert_many(
+        [
+            {
+                "user_id": 7,
+                "vocab_id": vocab_id,
+                "level": 2,
+                "next_learn": next_learn,
+                "quick_repeat": False,
+                "graduated": False,
+            }
+            for vocab_id, next_learn in [
+                (5, dt(2022, 2, 27)),
+                (6, dt(2022, 2, 28)),
+                (7, dt(2022, 3, 2)),
+            ]
+        ]
+    )
+    srs = SRS()
+    srs.vocabulary.fresh_window = 1
+    learned = {5, 6, 7, 0}
+
+    vocabs, frontier = srs.deck(7, now, n_words=4, learned=learned)
+    assert [v["vocab_id"] for v in vocabs] == [5, 6, 1, 2]
+    assert frontier == 1
+
+    vocabs, _ = srs.deck(7, now, n_words=4, max_vocabs=3, learned=learned)
+    assert [v["vocab_id"] for v in vocabs] == [5, 6, 1]
+
+    vocabs, _ = srs.deck(7, now, n_words=4, max_vocabs=1, learned=learned)
+    assert [v["vocab_id"] for v in vocabs] == [5]
+
+
+def test_vocabulary_ranks(mongo):
+    """
+    Tests that 'ensure_indexes' precomputes the frequency ranks, that a range is read with a
+    filter matching exactly the documents of the range, that the counts per abbreviation are
+    served from 'vocabulary_meta', and that the ranks are rebuilt once the collection changed.
+
+    Args:
+        mongo (Database): Fixture with the in-memory database.
+
+    Returns:
+        None
+    """
+    mongo.vocabulary.insert_many(
+        [
+            {"vocab_id": i, "freq": 10 - i, "abbr": "nm" if i % 2 else "vb"}
+            for i in range(8)
+        ]
+    )
+    vocabulary = Vocabulary()
+    vocabulary.ensure_indexes()
+
+    filters = []
+    find = vocabulary.col.find
+
+    def recording_find(where, *args, **kwargs):
+        filters.append(where)
+        return find(where, *args, **kwargs)
+
+    vocabulary.col.find = recording_find
+
+    assert [v["vocab_id"] for v in vocabulary.range(0, 3, abbr="nm")] == [
+        7,
+        5,
+        3,
+    ]
+    assert [v["vocab_id"] for v in vocabulary.range(0, 3)] == [7, 6, 5]
+    assert [mongo.vocabulary.count_documents(f) for f in filters] == [3, 3]
+
+    mongo.vocabulary.delete_one({"vocab_id": 7})
+    assert vocabulary.vocab_count("nm") == 4
+    assert vocabulary.vocab_count("vb") == 4
+
+    vocabulary.ensure_indexes()
+    assert vocabulary.vocab_count("nm") == 3
+    assert [v["vocab_id"] for v in vocabulary.range(0, 3, abbr="nm")] == [
+        5,
+        3,
+        1,
+    ]
+    assert [v["vocab_id"] for v in vocabulary.range(0, 3)] == [6, 5, 4]
+
+
+def test_practice_next_id(mongo, monkeypatch):
+    """
+    Tests that the practice_id sequence is seeded from the highest stored practice_id, hands
+    out consecutive IDs, and with a PRACTICE_ID_BLOCK larger than 1 serves a reserved block
+    without going back to the 'counters' collection.
+
+    Args:
+        mongo (Database): Fixture with the in-memory database.
+        monkeypatch (pytest.MonkeyPatch): Fixture to reset the reserved IDs, to set the block
+            size and to count the allocations.
+
+    Returns:
+        None
+    """
+    monkeypatch.setattr(Practice, "_ids", iter(()))
+    practice = Practice()
+    bucket_filter, update = Practice.bucket_update(
+        practice_id=41,
+        user_id=7,
+        timestamp=dt(2022, 3, 1, 8),
+        vocabs=[10],
+        attempts={"10": 1},
+    )
+    mongo.practice_buckets.update_one(bucket_filter, update, upsert=True)
+    practice.ensure_indexes()
+
+    assert [practice.next_id() for _ in range(2)] == [42, 43]
+
+    allocations = []
+    allocate = Counter.next
+
+    def counting_next(self, name, block=1):
+        allocations.append(block)
+        return allocate(self, name, block=block)
+
+    monkeypatch.setattr(Counter, "next", counting_next)
+    monkeypatch.setattr(Practice, "id_block", 3)
+
+    assert [practice.next_id() for _ in range(4)] == [44, 45, 46, 47]
+    assert allocations == [3, 3]
+    assert mongo.counters.find_one({"_id": "practice_id"})["seq"] == 49
+
+
+def test_practice_buckets(mongo):
+    """
+    Tests that sessions are stored in one bucket per user and month and are found on their
+    day, including sessions at the edges of a bucket, and that 'update' changes the fields
+    of a single session.
+
+    Args:
+        mongo (Database): Fixture with the in-memory database.
+
+    Returns:
+        None
+    """
+    practice = Practice()
+    practice.ensure_indexes()
+    practice.insert(1, 7, dt(2022, 3, 31, 23, 59), [10, 11], {"10": 1})
+    practice.insert(2, 7, dt(2022, 4, 1, 0, 0), [12], {"12": 2})
+    practice.insert(3, 8, dt(2022, 3, 31, 12), [10], {"10": 1})
+
+    assert mongo.practice_buckets.count_documents({}) == 3
+    assert practice.find(7, dt(2022, 3, 31, 8), tz="UTC") == {
+        "practice_id": 1,
+        "user_id": 7,
+        "timestamp": dt(2022, 3, 31, 23, 59),
+        "vocabs": [10, 11],
+        "attempts": {"10": 1, "11": 0},
+    }
+    assert practice.find(7, dt(2022, 4, 1, 20), tz="UTC")["practice_id"] == 2
+    assert (
+        practice.exists(7, dt(2022, 3, 31), return_count=True, tz="UTC") == 1
+    )
+    assert not practice.exists(7, dt(2022, 3, 30), tz="UTC")
+    assert practice.max_id() == 3
+
+    practice.update(2, {"$set": {"attempts": [1]}})
+
+    assert practice.find(7, dt(2022, 4, 1), tz="UTC")["attempts"] == {"12": 1}
+    assert practice.find(7, dt(2022, 3, 31), tz="UTC")["attempts"] == {
+        "10": 1,
+        "11": 0,
+    }
+
+
+def test_reminder_journal_claim(mongo):
+    """
+    Tests that a reminder is claimed only once, that pending claims are reclaimed once their
+    lease ran out, and that sent reminders and claims before 'since' are never reclaimed.
+
+    Args:
+        mongo (Database): Fixture with the in-memory database.
+
+    Returns:
+        None
+    """
+    journal = ReminderJournal()
+    tick = dt(2022, 3, 1, 7, 0)
+    claims = [
+        {
+            "_id": f"{user_id}:2022-03-01:08:00",
+            "user_id": user_id,
+            "tick": tick,
+        }
+        for user_id in (7, 8, 9)
+    ]
+
+    assert len(journal.claim(claims[:2], "a", lease=900)) == 2
+    assert [c["user_id"] for c in journal.claim(claims, "b", lease=900)] == [9]
+    assert journal.claim([], "b", lease=900) == []
+    assert journal.reclaim("b", lease=900, since=tick) == []
+
+    journal.sent(claims[0]["_id"])
+    mongo.reminder_journal.update_many(
+        {}, {"$set": {"lease_until": dt(2000, 1, 1)}}
+    )
+    mongo.reminder_journal.update_one(
+        {"_id": claims[2]["_id"]}, {"$set": {"tick": dt(2022, 3, 1, 6, 0)}}
+    )
+
+    reclaimed = journal.reclaim("b", lease=900, since=tick)
+    assert [(c["user_id"], c["owner"]) for c in reclaimed] == [(8, "b")]
+    assert journal.reclaim("c", lease=900, since=tick) == []
+    assert (
+        mongo.reminder_journal.find_one({"_id": claims[0]["_id"]})["state"]
+        == "sent"
+    )
+
+    journal.advance(tick)
+    journal.advance(dt(2022, 3, 1, 6, 59))
+    assert journal.last_tick() == tick
+
+
+def test_practice_local_day_across_buckets(mongo):
+    """
+    Tests that a local day that spans two monthly buckets in UTC reads both of them, e.g. the
+    1st of a month in Europe/Berlin, which starts in the previous month in UTC, and the last day
+    of a month in America/New_York, which ends in the next month in UTC.
+
+    Args:
+        mongo (Database): Fixture with the in-memory database.
+
+    Returns:
+        None
+    """
+    practice = Practice()
+    practice.insert(1, 7, dt(2022, 3, 1, 10), [10], {"10": 1})
+    practice.insert(2, 8, dt(2022, 3, 31, 22), [10], {"10": 1})
+    practice.insert(3, 8, dt(2022, 4, 1, 2), [11], {"11": 1})
+
+    assert practice.exists(7, dt(2022, 3, 1, 12), tz="Europe/Berlin")
+    assert practice.exists(7, dt(2022, 2, 28, 23, 30), tz="Europe/Berlin")
+    assert practice.exists(7, dt(2022, 3, 1, 12), tz="UTC")
+
+    sessions = practice.sessions(8, dt(2022, 3, 31, 12), tz="America/New_York")
+    assert [s["practice_id"] for s in sessions] == [2, 3]
+
+
+def test_reminders_ignore_stale_cache(mongo):
+    """
+    Tests that adding a reminder or changing the timezone keeps reminders that another process
+    cleared in the meantime cleared, although this process still caches the old ones.
+
+    Args:
+        mongo (Database): Fixture with the in-memory database.
+
+    Returns:
+        None
+    """
+    user = User()
+    user.insert(7, "Ana", 5, ["08:00"], dt(2022, 3, 1), tz="UTC")
+    assert user.find(7)["reminder"] == ["08:00"]
+
+    mongo.user.update_one(
+        {"user_id": 7}, {"$set": {"reminder": [], "reminder_utc": []}}
+    )
+    user.add_reminder(7, "09:30")
+
+    doc = mongo.user.find_one({"user_id": 7})
+    assert doc["reminder"] == ["09:30"]
+    assert doc["reminder_utc"] == [570]
+    assert user.find(7)["reminder"] == ["09:30"]
+
+    mongo.user.update_one(
+        {"user_id": 7}, {"$set": {"reminder": [], "reminder_utc": []}}
+    )
+    user.schedule(7, tz="Asia/Kolkata")
+
+    doc = mongo.user.find_one({"user_id": 7})
+    assert (doc["reminder"], doc["reminder_utc"], doc["tz"]) == (
+        [],
+        [],
+        "Asia/Kolkata",
+    )
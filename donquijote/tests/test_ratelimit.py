@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+from telegram.error import RetryAfter
+
+from donquijote.util.ratelimit import RateLimiter, TokenBucket
+
+
+def test_token_bucket(clock):
+    """
+    Tests that a token bucket allows a burst up to its capacity and then paces to its rate.
+
+    Args:
+        clock (Clock): Fixture with a manually advanced clock.
+
+    Returns:
+        None
+    """
+    bucket = TokenBucket(rate=10, capacity=2, clock=clock)
+
+    assert bucket.delay() == 0
+    assert bucket.delay() == 0
+    assert bucket.delay() == 0.1
+    assert bucket.delay() == 0.2
+
+    clock.now = 10.0
+    assert bucket.delay() == 0
+
+
+def test_token_bucket_pause(clock):
+    """
+    Tests that 'pause' withholds all tokens for the given number of seconds.
+
+    Args:
+        clock (Clock): Fixture with a manually advanced clock.
+
+    Returns:
+        None
+    """
+    bucket = TokenBucket(rate=10, clock=clock)
+    bucket.pause(3)
+
+    assert round(bucket.delay(), 6) == 3.1
+
+    clock.now = 5.0
+    assert bucket.delay() == 0
+
+
+def test_rate_limiter(clock):
+    """
+    Tests that a rate limiter paces every chat to its own rate, while other chats only wait
+    for the global bucket, and that it tracks the wait times.
+
+    Args:
+        clock (Clock): Fixture with a manually advanced clock.
+
+    Returns:
+        None
+    """
+    limiter = RateLimiter(
+        rate=10, chat_rate=1, chat_burst=1, clock=clock, sleep=clock.sleep
+    )
+
+    async def run():
+        return [
+            await limiter.acquire(1),
+            await limiter.acquire(1),
+            await limiter.acquire(2),
+        ]
+
+    assert asyncio.run(run()) == [0, 1.0, 0]
+    assert limiter.stats() == {
+        "waiting": 0,
+        "acquired": 3,
+        "avg_wait": 1 / 3,
+        "max_wait": 1.0,
+    }
+
+
+def test_rate_limiter_retry_after(clock):
+    """
+    Tests that a RetryAfter raised by a limited method pauses the global bucket.
+
+    Args:
+        clock (Clock): Fixture with a manually advanced clock.
+
+    Returns:
+        None
+    """
+    limiter = RateLimiter(rate=10, clock=clock, sleep=clock.sleep)
+
+    async def method():
+        raise RetryAfter(2)
+
+    with pytest.raises(RetryAfter):
+        asyncio.run(limiter.limit(1, method)())
+
+    assert asyncio.run(limiter.acquire(2)) == pytest.approx(2.1)
@@ -0,0 +1,79 @@
+import asyncio
+from datetime import datetime as dt
+
+import pytz
+
+from donquijote.bot import remindbot
+from donquijote.db.asyncmongodb import AsyncSRS
+from donquijote.util.timezone import day_ordinal
+
+
+def test_enrich(mongo, monkeypatch):
+    """
+    Tests that 'enrich' drops the users who already practised on their local day and counts the
+    words every other user has to repeat by their local midnight.
+
+    Args:
+        mongo (Database): Fixture with the in-memory database.
+        monkeypatch (pytest.MonkeyPatch): Fixture to point the SRS DAO of the remind bot at the
+            in-memory database.
+
+    Returns:
+        None
+    """
+    monkeypatch.setattr(remindbot, "srs", AsyncSRS())
+    tick = pytz.utc.localize(dt(2022, 3, 1, 3, 0))
+    # 03:00 UTC is March 1 in Berlin, where the day started at 23:00 UTC, and still
+    # February 28 in New York, where the day started at 05:00 UTC on February 28.
+    mongo.srs.insert_many(
+        [
+            {
+                "user_id": 7,
+                "next_learn": dt(2022, 2, 28, 23),
+                "graduated": False,
+            },
+            {
+                "user_id": 7,
+                "next_learn": dt(2022, 3, 1, 23),
+                "graduated": False,
+            },
+            {"user_id": 7, "next_learn": dt(2022, 2, 20), "graduated": True},
+            {
+                "user_id": 8,
+                "next_learn": dt(2022, 2, 28, 23),
+                "graduated": False,
+            },
+            {
+                "user_id": 8,
+                "next_learn": dt(2022, 2, 28, 3),
+                "graduated": False,
+            },
+        ]
+    )
+    users = [
+        {"user_id": 7, "name": "Ana", "tz": "Europe/Berlin"},
+        {"user_id": 8, "name": "Bob", "tz": "America/New_York"},
+        {
+            "user_id": 9,
+            "name": "Eva",
+            "tz": "Europe/Berlin",
+            "last_practice_day": day_ordinal(
+                "Europe/Berlin", dt(2022, 3, 1, 3)
+            ),
+        },
+        {
+            "user_id": 10,
+            "name": "Leo",
+            "tz": "America/New_York",
+            "last_practice_day": day_ordinal("UTC", dt(2022, 3, 1, 3)),
+        },
+    ]
+
+    reminders = asyncio.run(remindbot.enrich([(u, tick) for u in users]))
+
+    assert [(u["user_id"], due) for u, _, due in reminders] == [
+        (7, 1),
+        (8, 1),
+        (10, 0),
+    ]
+    assert all(t == tick for _, t, _ in reminders)
@@ -0,0 +1,169 @@
+import asyncio
+
+import pytest
+from telegram.error import BadRequest, Forbidden, RetryAfter, TimedOut
+
+from donquijote.util.retry import (
+    PERMANENT,
+    RETRY_AFTER,
+    TRANSIENT,
+    CircuitBreaker,
+    CircuitOpen,
+    RetryPolicy,
+    classify,
+)
+
+
+def flaky(*errors):
+    """
+    Returns an API method that raises the given errors one after the other and then succeeds.
+
+    Args:
+        *errors (Exception): The errors to raise.
+
+    Returns:
+        Callable[[], Awaitable[str]]: The API method.
+    """
+    errors = list(errors)
+
+    async def method():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    method.errors = errors
+    return method
+
+
+@pytest.mark.parametrize(
+    "error, kind",
+    [
+        (RetryAfter(3), RETRY_AFTER),
+        (TimedOut(), TRANSIENT),
+        (BadRequest("Chat not found"), PERMANENT),
+        (Forbidden("Bot was blocked by the user"), PERMANENT),
+        (ValueError(), PERMANENT),
+    ],
+)
+def test_classify(error, kind):
+    """
+    Tests the classification of Telegram errors.
+
+    Args:
+        error (Exception): The raised error.
+        kind (str): The expected classification.
+
+    Returns:
+        None
+    """
+    assert classify(error) == kind
+
+
+def test_retry_policy(clock):
+    """
+    Tests that transient errors are retried, a RetryAfter is honoured and permanent errors are
+    raised right away.
+
+    Args:
+        clock (Clock): Fixture with a manually advanced clock.
+
+    Returns:
+        None
+    """
+    policy = RetryPolicy(clock=clock, sleep=clock.sleep)
+
+    assert asyncio.run(policy.run(flaky(TimedOut(), RetryAfter(7)))) == "ok"
+    assert 7 <= clock.now <= 7.5
+
+    method = flaky(Forbidden("Bot was blocked by the user"), TimedOut())
+    with pytest.raises(Forbidden):
+        asyncio.run(policy.run(method))
+    assert len(method.errors) == 1
+
+
+def test_retry_policy_budget(clock):
+    """
+    Tests that retries stop after the maximum number of attempts and at the deadline.
+
+    Args:
+        clock (Clock): Fixture with a manually advanced clock.
+
+    Returns:
+        None
+    """
+    policy = RetryPolicy(max_attempts=3, clock=clock, sleep=clock.sleep)
+    method = flaky(*[TimedOut() for _ in range(5)])
+    with pytest.raises(TimedOut):
+        asyncio.run(policy.run(method))
+    assert len(method.errors) == 2
+
+    policy = RetryPolicy(deadline=10, clock=clock, sleep=clock.sleep)
+    method = flaky(RetryAfter(30))
+    with pytest.raises(RetryAfter):
+        asyncio.run(policy.run(method))
+
+
+def test_circuit_breaker(clock):
+    """
+    Tests that the circuit opens after consecutive failures, fails fast while open and lets a
+    single trial call through after the reset timeout.
+
+    Args:
+        clock (Clock): Fixture with a manually advanced clock.
+
+    Returns:
+        None
+    """
+    breaker = CircuitBreaker(
+        failure_threshold=2, reset_timeout=30, clock=clock
+    )
+    policy = RetryPolicy(
+        max_attempts=1, breaker=breaker, clock=clock, sleep=clock.sleep
+    )
+
+    for _ in range(2):
+        with pytest.raises(TimedOut):
+            asyncio.run(policy.run(flaky(TimedOut())))
+    with pytest.raises(CircuitOpen):
+        asyncio.run(policy.run(flaky()))
+
+    clock.now += 30
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.success()
+    assert asyncio.run(policy.run(flaky())) == "ok"
+
+
+@pytest.mark.parametrize("error", [ValueError(), asyncio.CancelledError()])
+def test_circuit_breaker_releases_trial(clock, error):
+    """
+    Tests that a trial call that fails with an error that isn't the API's or is cancelled
+    doesn't keep the circuit half-open, so the next call is let through as a new trial.
+
+    Args:
+        clock (Clock): Fixture with a manually advanced clock.
+        error (BaseException): The error raised by the trial call.
+
+    Returns:
+        None
+    """
+    breaker = CircuitBreaker(
+        failure_threshold=1, reset_timeout=30, clock=clock
+    )
+    policy = RetryPolicy(
+        max_attempts=1, breaker=breaker, clock=clock, sleep=clock.sleep
+    )
+
+    with pytest.raises(TimedOut):
+        asyncio.run(policy.run(flaky(TimedOut())))
+
+    clock.now += 30
+
+    async def trial():
+        raise error
+
+    with pytest.raises(type(error)):
+        asyncio.run(policy.run(trial))
+    assert breaker.opened_at is not None
+    assert asyncio.run(policy.run(flaky())) == "ok"
+    assert breaker.opened_at is None
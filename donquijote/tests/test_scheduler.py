@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime as dt
+
+from telegram.error import Forbidden, NetworkError, RetryAfter, TimedOut
+
+from donquijote.bot.scheduler import Fanout, next_tick
+
+
+def test_next_tick():
+    """
+    Tests that 'next_tick' returns the start of the following minute.
+
+    Returns:
+        None
+    """
+    assert next_tick(dt(2022, 3, 1, 8, 29, 59, 999)) == dt(2022, 3, 1, 8, 30)
+    assert next_tick(dt(2022, 3, 1, 23, 59)) == dt(2022, 3, 2, 0, 0)
+
+
+def test_fanout():
+    """
+    Tests that the fan-out delivers every message, retries after a RetryAfter and after
+    transient errors, and reports failed messages.
+
+    Returns:
+        None
+    """
+    sent = []
+    retried = set()
+    attempts = {}
+
+    async def send(chat_id, text):
+        attempts[chat_id] = attempts.get(chat_id, 0) + 1
+        if chat_id == 2 and chat_id not in retried:
+            retried.add(chat_id)
+            raise RetryAfter(0)
+        if chat_id == 3:
+            raise Forbidden("bot was blocked by the user")
+        if chat_id == 5 and attempts[chat_id] < 3:
+            raise TimedOut()
+        if chat_id == 6:
+            raise NetworkError("Connection reset")
+        sent.append((chat_id, text))
+
+    async def run():
+        fanout = Fanout(
+            send, workers=4, rate=1000, chat_interval=0, retry_delay=0.01
+        )
+        fanout.start()
+        report = fanout.submit(
+            dt(2022, 3, 1, 8), [(i, f"Hola {i}") for i in range(7)]
+        )
+        await asyncio.wait_for(report.done.wait(), 5)
+        await fanout.stop()
+
+        return report
+
+    report = asyncio.run(run())
+
+    assert sorted(sent) == [(i, f"Hola {i}") for i in (0, 1, 2, 4, 5)]
+    assert (report.total, report.sent, report.failed) == (7, 5, 2)
+    assert (attempts[3], attempts[5], attempts[6]) == (1, 3, 3)
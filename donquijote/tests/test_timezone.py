@@ -0,0 +1,79 @@
+from datetime import datetime as dt
+
+from donquijote.util.timezone import (
+    day_ordinal,
+    day_start,
+    is_timezone,
+    utc_minutes,
+    utc_offset,
+)
+
+
+def test_utc_offset():
+    """
+    Tests that the UTC offset follows the DST rules of the timezone.
+
+    Returns:
+        None
+    """
+    assert utc_offset("Europe/Berlin", dt(2022, 1, 15, 12)) == 60
+    assert utc_offset("Europe/Berlin", dt(2022, 7, 15, 12)) == 120
+    assert utc_offset("America/New_York", dt(2022, 1, 15, 12)) == -300
+    assert utc_offset("UTC", dt(2022, 7, 15, 12)) == 0
+
+
+def test_utc_minutes():
+    """
+    Tests the conversion of local reminder times to minutes of the UTC day.
+
+    Returns:
+        None
+    """
+    assert utc_minutes(["08:00", "00:30"], 60) == [420, 1410]
+    assert utc_minutes(["20:00"], -300) == [60]
+    assert utc_minutes(["24:00"], 0) == [0]
+
+
+def test_day_start():
+    """
+    Tests that days start at local midnight, given and returned as naive UTC time.
+
+    Returns:
+        None
+    """
+    # 23:30 UTC on March 1 is already March 2 in Berlin
+    assert day_start("Europe/Berlin", dt(2022, 3, 1, 23, 30)) == dt(
+        2022, 3, 1, 23
+    )
+    assert day_start("Europe/Berlin", dt(2022, 7, 1, 12)) == dt(
+        2022, 6, 30, 22
+    )
+    # the day after the switch to CEST starts an hour earlier in UTC
+    assert day_start("Europe/Berlin", dt(2022, 3, 27, 12), days=1) == dt(
+        2022, 3, 27, 22
+    )
+    assert day_start("UTC", dt(2022, 3, 1, 8), days=3) == dt(2022, 3, 4)
+
+
+def test_day_ordinal():
+    """
+    Tests that the day ordinal is the one of the local date.
+
+    Returns:
+        None
+    """
+    now = dt(2022, 3, 1, 23, 30)
+
+    assert day_ordinal("Europe/Berlin", now) == dt(2022, 3, 2).toordinal()
+    assert day_ordinal("America/New_York", now) == dt(2022, 3, 1).toordinal()
+
+
+def test_is_timezone():
+    """
+    Tests the validation of timezone names.
+
+    Returns:
+        None
+    """
+    assert is_timezone("Europe/Madrid")
+    assert not is_timezone("Mars/Olympus_Mons")
@@ -0,0 +1,110 @@
+import pytest
+
+from donquijote.db.vocabstore import VocabularyStore
+from donquijote.util.bitset import Bitset
+
+ABBRS = ["nf", "nm", "v", "adj"]
+
+
+@pytest.fixture
+def store():
+    """
+    Returns a VocabularyStore with 100 vocabularies, inserted in reverse frequency order.
+
+    Returns:
+        VocabularyStore
+    """
+    return VocabularyStore(
+        [
+            {
+                "vocab_id": i,
+                "freq": i + 1,
+                "abbr": ABBRS[i % 4],
+                "sp": f"sp{i}",
+            }
+            for i in reversed(range(100))
+        ]
+    )
+
+
+def test_find(store):
+    """
+    Tests that 'find' returns copies of the documents and None for unknown IDs.
+
+    Args:
+        store (VocabularyStore): The store fixture.
+
+    Returns:
+        None
+    """
+    vocab = store.find(42)
+    vocab["sp"] = "changed"
+
+    assert store.find(42)["sp"] == "sp42"
+    assert store.find(1000) is None
+    assert [v["vocab_id"] for v in store.from_vocab_list([5, 1000, 3])] == [
+        5,
+        3,
+    ]
+
+
+def test_range(store):
+    """
+    Tests that 'range' and 'vocab_count' follow the frequency order per abbreviation.
+
+    Args:
+        store (VocabularyStore): The store fixture.
+
+    Returns:
+        None
+    """
+    assert [v["vocab_id"] for v in store.range(0, 3, abbr="v")] == [2, 6, 10]
+    assert [v["vocab_id"] for v in store.range(3, 5)] == [3, 4]
+    assert store.vocab_count("v") == 25
+    assert store.vocab_count("unknown") == 0
+
+
+@pytest.mark.parametrize("n_excluded", [(0), (50), (97), (100)])
+def test_sample(store, n_excluded):
+    """
+    Tests that 'sample' returns distinct vocabularies that are not excluded, also when
+    almost all vocabularies are excluded.
+
+    Args:
+        store (VocabularyStore): The store fixture.
+        n_excluded (int): The number of excluded vocabularies.
+
+    Returns:
+        None
+    """
+    exclude = set(range(n_excluded))
+    sample = [v["vocab_id"] for v in store.sample(5, exclude=exclude)]
+
+    assert len(sample) == min(5, 100 - n_excluded)
+    assert len(set(sample)) == len(sample)
+    assert not exclude.intersection(sample)
+
+
+def test_fresh(store):
+    """
+    Tests that 'fresh' picks unlearned vocabularies from the window after the frontier
+    and moves the frontier to the first unlearned vocabulary.
+
+    Args:
+        store (VocabularyStore): The store fixture.
+
+    Returns:
+        None
+    """
+    learned = Bitset()
+    for i in [*range(10), 12]:
+        learned.add(i)
+
+    fresh, frontier = store.fresh(3, learned, frontier=0, window=5)
+    fresh_ids = [v["vocab_id"] for v in fresh]
+
+    assert frontier == 10
+    assert len(fresh_ids) == 3
+    assert set(fresh_ids) <= {10, 11, 13, 14, 15}
+    assert fresh_ids == sorted(fresh_ids)
+    assert store.fresh(3, set(range(100)), frontier=frontier) == ([], 100)
@@ -0,0 +1,93 @@
+from bson.int64 import Int64
+
+WORD_BITS = 32
+
+
+class Bitset:
+    """
+    A set of non-negative integers stored as a dict of 32 bit words, the way it is persisted
+    in MongoDB. Keys are the word indices as strings, so a bit can be set atomically with
+    {"$bit": {"<field>.<word>": {"or": <mask>}}}.
+
+    Attributes:
+        words (Dict[str, int]): Maps the word index to the bits of the word.
+
+    Methods:
+        add(self, i): Adds an integer to the set.
+        masks(indices): Returns the word masks that set the given integers.
+        bit_update(field, indices): Returns a $bit update that adds the given integers to a stored set.
+    """
+
+    def __init__(self, words=None):
+        """
+        Initializes the set from the stored words.
+
+        Args:
+            words (Dict[str, int], optional): The stored words.
+
+        Returns:
+            None
+        """
+        self.words = {k: int(v) for k, v in (words or {}).items()}
+
+    def __contains__(self, i):
+        return bool(
+            self.words.get(str(i // WORD_BITS), 0) & (1 << (i % WORD_BITS))
+        )
+
+    def __iter__(self):
+        for k, word in sorted(self.words.items(), key=lambda x: int(x[0])):
+            for bit in range(WORD_BITS):
+                if word & (1 << bit):
+                    yield int(k) * WORD_BITS + bit
+
+    def __len__(self):
+        return sum(bin(word).count("1") for word in self.words.values())
+
+    def add(self, i):
+        """
+        Adds an integer to the set.
+
+        Args:
+            i (int): The integer to add.
+
+        Returns:
+            None
+        """
+        k = str(i // WORD_BITS)
+        self.words[k] = self.words.get(k, 0) | (1 << (i % WORD_BITS))
+
+    @staticmethod
+    def masks(indices):
+        """
+        Returns the word masks that set the given integers.
+
+        Args:
+            indices (Iterable[int]): The integers.
+
+        Returns:
+            Dict[str, int]: Maps the word index to the mask of the word.
+        """
+        masks = {}
+        for i in indices:
+            k = str(i // WORD_BITS)
+            masks[k] = masks.get(k, 0) | (1 << (i % WORD_BITS))
+
+        return masks
+
+    @staticmethod
+    def bit_update(field, indices):
+        """
+        Returns the operand of a $bit update that adds the given integers to a stored set.
+
+        Args:
+            field (str): The name of the document field holding the set.
+            indices (Iterable[int]): The integers to add.
+
+        Returns:
+            Dict[str, Dict]: The operand of the $bit update operator.
+        """
+        return {
+            f"{field}.{k}": {"or": Int64(mask)}
+            for k, mask in Bitset.masks(indices).items()
+        }
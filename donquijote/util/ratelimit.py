@@ -0,0 +1,235 @@
+import asyncio
+import time
+
+from telegram.error import RetryAfter
+
+
+class TokenBucket:
+    """
+    A token bucket that paces callers to a sustained rate with a bounded burst. Tokens are
+    reserved in call order, so waiting callers are served first come, first served, and the
+    bucket can be shared by any number of coroutines of one event loop.
+
+    Attributes:
+        rate (float): The number of tokens added per second.
+        capacity (float): The maximum number of tokens, i.e. the largest burst.
+        tokens (float): The current number of tokens. Negative while callers wait for reserved
+            tokens.
+
+    Methods:
+        delay(self): Reserves a token and returns the seconds until it becomes available.
+        acquire(self): Waits until a token is available.
+        pause(self, seconds): Withholds all tokens for a number of seconds.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        """
+        Initializes a full bucket.
+
+        Args:
+            rate (float): The number of tokens added per second.
+            capacity (float, optional): The maximum number of tokens, defaults to the rate.
+            clock (Callable[[], float], optional): The clock used to refill the bucket.
+
+        Returns:
+            None
+        """
+        self.rate = rate
+        self.capacity = rate if capacity is None else capacity
+        self.clock = clock
+        self.tokens = self.capacity
+        self._updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def delay(self):
+        """
+        Reserves a token and returns the number of seconds until it becomes available.
+
+        Returns:
+            float: The seconds to wait before using the token, 0 if it is available now.
+        """
+        self._refill()
+        self.tokens -= 1
+
+        return max(-self.tokens / self.rate, 0)
+
+    async def acquire(self):
+        """
+        Waits until a token is available.
+
+        Returns:
+            float: The seconds waited.
+        """
+        delay = self.delay()
+        if delay:
+            await asyncio.sleep(delay)
+
+        return delay
+
+    def pause(self, seconds):
+        """
+        Withholds all tokens for a number of seconds, e.g. after the API asked to retry later.
+
+        Args:
+            seconds (float): The number of seconds to withhold the tokens for.
+
+        Returns:
+            None
+        """
+        self._refill()
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class RateLimiter:
+    """
+    Paces outgoing API calls with a global token bucket shared by all chats and a token
+    bucket per chat. Callers wait for a token of their chat first and then for a global
+    token, so a busy chat never holds global tokens it can't use yet. Calls are queued,
+    never rejected, and the queue depth and the time spent waiting are tracked.
+
+    Attributes:
+        bucket (TokenBucket): The global token bucket.
+        chat_rate (float): The number of calls per second to a chat.
+        chat_burst (float): The largest burst of calls to a chat.
+        waiting (int): The number of callers currently waiting for a token.
+        acquired (int): The number of tokens handed out.
+        waited (float): The total number of seconds callers waited.
+        max_wait (float): The longest wait of a caller in seconds.
+
+    Methods:
+        acquire(self, chat_id): Waits until a call to a chat may be made.
+        limit(self, chat_id, func): Wraps an API method into the limiter.
+        pause(self, seconds): Withholds all global tokens for a number of seconds.
+        stats(self): Returns the queue depth and the wait times.
+    """
+
+    def __init__(
+        self,
+        rate=30.0,
+        chat_rate=1.0,
+        chat_burst=3,
+        clock=time.monotonic,
+        sleep=asyncio.sleep,
+    ):
+        """
+        Initializes the limiter with full buckets.
+
+        Args:
+            rate (float, optional): The global number of calls per second.
+            chat_rate (float, optional): The number of calls per second to a chat.
+            chat_burst (float, optional): The largest burst of calls to a chat.
+            clock (Callable[[], float], optional): The clock used to refill the buckets.
+            sleep (Callable[[float], Awaitable], optional): Waits for a token.
+
+        Returns:
+            None
+        """
+        self.bucket = TokenBucket(rate, clock=clock)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.clock = clock
+        self.sleep = sleep
+        self.waiting = 0
+        self.acquired = 0
+        self.waited = 0.0
+        self.max_wait = 0.0
+        self._chats = {}
+        self._prune_at = 1024
+
+    def _chat(self, chat_id):
+        if len(self._chats) >= self._prune_at:
+            for key, bucket in list(self._chats.items()):
+                bucket._refill()
+                if bucket.tokens >= bucket.capacity:
+                    del self._chats[key]
+            self._prune_at = max(1024, 2 * len(self._chats))
+
+        if chat_id not in self._chats:
+            self._chats[chat_id] = TokenBucket(
+                self.chat_rate, capacity=self.chat_burst, clock=self.clock
+            )
+
+        return self._chats[chat_id]
+
+    async def acquire(self, chat_id):
+        """
+        Waits until a call to a chat may be made.
+
+        Args:
+            chat_id (int): The chat the call goes to.
+
+        Returns:
+            float: The seconds waited.
+        """
+        started = self.clock()
+        self.waiting += 1
+        try:
+            for bucket in (self._chat(chat_id), self.bucket):
+                delay = bucket.delay()
+                if delay:
+                    await self.sleep(delay)
+        finally:
+            self.waiting -= 1
+
+        waited = self.clock() - started
+        self.acquired += 1
+        self.waited += waited
+        self.max_wait = max(self.max_wait, waited)
+
+        return waited
+
+    def limit(self, chat_id, func):
+        """
+        Wraps an API method so every call waits for a token first. A RetryAfter raised by
+        the method pauses the global bucket before it is passed on.
+
+        Args:
+            chat_id (int): The chat the calls go to.
+            func (Callable[..., Awaitable]): The API method.
+
+        Returns:
+            Callable[..., Awaitable]: The limited API method.
+        """
+
+        async def limited(*args, **kwargs):
+            await self.acquire(chat_id)
+            try:
+                return await func(*args, **kwargs)
+            except RetryAfter as e:
+                self.pause(e.retry_after)
+                raise
+
+        return limited
+
+    def pause(self, seconds):
+        """
+        Withholds all global tokens for a number of seconds, see TokenBucket.pause.
+
+        Args:
+            seconds (float): The number of seconds to withhold the tokens for.
+
+        Returns:
+            None
+        """
+        self.bucket.pause(seconds)
+
+    def stats(self):
+        """
+        Returns the queue depth and the wait times.
+
+        Returns:
+            Dict[str, float]: The number of waiting callers, the number of tokens handed
+                out, and the average and longest wait in seconds.
+        """
+        return {
+            "waiting": self.waiting,
+            "acquired": self.acquired,
+            "avg_wait": self.waited / self.acquired if self.acquired else 0.0,
+            "max_wait": self.max_wait,
+        }
@@ -0,0 +1,275 @@
+import asyncio
+import random
+import time
+
+from telegram.error import (
+    BadRequest,
+    ChatMigrated,
+    Forbidden,
+    InvalidToken,
+    NetworkError,
+    RetryAfter,
+    TelegramError,
+    TimedOut,
+)
+
+PERMANENT = "permanent"
+RETRY_AFTER = "retry_after"
+TRANSIENT = "transient"
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling the API while the circuit breaker is open."""
+
+
+def classify(error):
+    """
+    Classifies an error raised by a Telegram API call.
+
+    BadRequest is a subclass of NetworkError, so it has to be checked first.
+
+    Args:
+        error (Exception): The raised error.
+
+    Returns:
+        str: RETRY_AFTER if the API asked to slow down, TRANSIENT if a retry may succeed
+            and PERMANENT otherwise, e.g. for a blocked bot or an invalid chat ID.
+    """
+    if isinstance(error, RetryAfter):
+        return RETRY_AFTER
+    if isinstance(error, (BadRequest, Forbidden, InvalidToken, ChatMigrated)):
+        return PERMANENT
+    if isinstance(error, (TimedOut, NetworkError)):
+        return TRANSIENT
+
+    return PERMANENT
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker that sheds load while the Telegram API is degraded. After a number of
+    consecutive transient failures the circuit opens and calls fail fast. Once the reset
+    timeout has passed, a single trial call is let through; if it succeeds, the circuit
+    closes again, otherwise it stays open for another reset timeout.
+
+    Attributes:
+        failure_threshold (int): The number of consecutive failures that open the circuit.
+        reset_timeout (float): The number of seconds the circuit stays open.
+        failures (int): The number of consecutive failures.
+        opened_at (float): The time the circuit opened, None while it is closed.
+
+    Methods:
+        allow(self): Checks whether a call may be made.
+        success(self): Records a successful call.
+        failure(self): Records a failed call.
+        release(self): Ends a trial call without recording it.
+    """
+
+    def __init__(
+        self, failure_threshold=5, reset_timeout=30, clock=time.monotonic
+    ):
+        """
+        Initializes a closed circuit.
+
+        Args:
+            failure_threshold (int, optional): The number of consecutive failures that open
+                the circuit.
+            reset_timeout (float, optional): The number of seconds the circuit stays open.
+            clock (Callable[[], float], optional): The clock used for the reset timeout.
+
+        Returns:
+            None
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def allow(self):
+        """
+        Checks whether a call may be made. While the circuit is open, only one trial call
+        per reset timeout is allowed.
+
+        Returns:
+            bool: True if the call may be made, False if it must fail fast.
+        """
+        if self.opened_at is None:
+            return True
+        if self._trial or self.clock() - self.opened_at < self.reset_timeout:
+            return False
+
+        self._trial = True
+        return True
+
+    def success(self):
+        """
+        Records a successful call and closes the circuit.
+
+        Returns:
+            None
+        """
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def failure(self):
+        """
+        Records a failed call and opens the circuit after too many consecutive failures or
+        a failed trial call.
+
+        Returns:
+            None
+        """
+        self.failures += 1
+        if self._trial or self.failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+        self._trial = False
+
+    def release(self):
+        """
+        Ends a trial call that says nothing about the API, e.g. because it was cancelled or
+        failed with an error of its own. The circuit stays open and the next call after the
+        reset timeout is let through as a new trial.
+
+        Returns:
+            None
+        """
+        self._trial = False
+
+
+class RetryPolicy:
+    """
+    An awaitable retry policy for Telegram API calls. Transient errors are retried with
+    exponential backoff and full jitter, a RetryAfter is honoured by waiting as long as the
+    API asked, and permanent errors are raised right away. Retries stop after a maximum
+    number of attempts or once the next wait would exceed the deadline.
+
+    Attributes:
+        max_attempts (int): The maximum number of attempts per call.
+        base_delay (float): The backoff of the first retry in seconds.
+        max_delay (float): The maximum backoff in seconds.
+        deadline (float): The maximum number of seconds spent on a call including the waits.
+        breaker (CircuitBreaker): The circuit breaker shared by all calls, None to disable it.
+
+    Methods:
+        backoff(self, attempt): Returns the wait before a retry.
+        run(self, func, *args, **kwargs): Calls an API method under the policy.
+    """
+
+    def __init__(
+        self,
+        max_attempts=5,
+        base_delay=0.5,
+        max_delay=10,
+        deadline=60,
+        breaker=None,
+        clock=time.monotonic,
+        sleep=asyncio.sleep,
+    ):
+        """
+        Initializes the retry policy.
+
+        Args:
+            max_attempts (int, optional): The maximum number of attempts per call.
+            base_delay (float, optional): The backoff of the first retry in seconds.
+            max_delay (float, optional): The maximum backoff in seconds.
+            deadline (float, optional): The maximum number of seconds spent on a call.
+            breaker (CircuitBreaker, optional): The circuit breaker shared by all calls.
+            clock (Callable[[], float], optional): The clock used for the deadline.
+            sleep (Callable[[float], Awaitable], optional): Waits between the attempts.
+
+        Returns:
+            None
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.breaker = breaker
+        self.clock = clock
+        self.sleep = sleep
+
+    def backoff(self, attempt):
+        """
+        Returns the wait before a retry, drawn uniformly between zero and the exponential
+        backoff of the attempt.
+
+        Args:
+            attempt (int): The number of the failed attempt, starting at 1.
+
+        Returns:
+            float: The number of seconds to wait.
+        """
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        )
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Calls an API method under the policy.
+
+        Args:
+            func (Callable[..., Awaitable]): The API method.
+            *args: The positional arguments of the method.
+            **kwargs: The keyword arguments of the method.
+
+        Returns:
+            Any: The result of the method.
+
+        Raises:
+            CircuitOpen: If the circuit breaker is open.
+            Exception: The last error if it is permanent or the attempts or the deadline are
+                used up.
+        """
+        started = self.clock()
+        attempt = 0
+        while True:
+            if self.breaker is not None and not self.breaker.allow():
+                raise CircuitOpen("The Telegram API is unavailable")
+
+            # While the circuit is open, allow only lets the trial call through.
+            trial = (
+                self.breaker is not None and self.breaker.opened_at is not None
+            )
+            recorded = False
+
+            attempt += 1
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                kind = classify(e)
+                if kind == PERMANENT:
+                    if self.breaker is not None and isinstance(
+                        e, TelegramError
+                    ):
+                        self.breaker.success()
+                        recorded = True
+                    raise
+                if kind == RETRY_AFTER:
+                    if self.breaker is not None:
+                        self.breaker.success()
+                    delay = e.retry_after
+                else:
+                    if self.breaker is not None:
+                        self.breaker.failure()
+                    delay = self.backoff(attempt)
+                recorded = True
+
+                if (
+                    attempt >= self.max_attempts
+                    or self.clock() - started + delay > self.deadline
+                ):
+                    raise
+                await self.sleep(delay)
+            else:
+                if self.breaker is not None:
+                    self.breaker.success()
+                recorded = True
+                return result
+            finally:
+                # A trial that ends without an outcome, e.g. cancelled or failed with an
+                # error that isn't the API's, must not keep the circuit half-open forever.
+                if trial and not recorded:
+                    self.breaker.release()
@@ -0,0 +1,118 @@
+from datetime import datetime as dt
+from datetime import timedelta as td
+
+import pytz
+
+DEFAULT_TIMEZONE = "Europe/Berlin"
+MINUTES_PER_DAY = 24 * 60
+
+
+def timezone(name=None):
+    """
+    Returns a timezone by name.
+
+    Args:
+        name (str, optional): The IANA name of the timezone, defaults to DEFAULT_TIMEZONE.
+
+    Returns:
+        pytz.tzinfo.BaseTzInfo: The timezone.
+    """
+    return pytz.timezone(name or DEFAULT_TIMEZONE)
+
+
+def is_timezone(name):
+    """
+    Checks whether a name is a known IANA timezone name.
+
+    Args:
+        name (str): The name to check.
+
+    Returns:
+        bool: True if the name is a known timezone, False otherwise.
+    """
+    return name in pytz.all_timezones_set
+
+
+def local_now(tz=None, now=None):
+    """
+    Converts a UTC time to the local time of a timezone.
+
+    Args:
+        tz (str, optional): The name of the timezone.
+        now (datetime, optional): The naive UTC time, defaults to the current time.
+
+    Returns:
+        datetime: The aware local time.
+    """
+    now = dt.utcnow() if now is None else now
+
+    return pytz.utc.localize(now).astimezone(timezone(tz))
+
+
+def day_ordinal(tz=None, now=None):
+    """
+    Returns the ordinal of the local date of a UTC time, see datetime.date.toordinal.
+
+    Args:
+        tz (str, optional): The name of the timezone.
+        now (datetime, optional): The naive UTC time, defaults to the current time.
+
+    Returns:
+        int: The ordinal of the local date.
+    """
+    return local_now(tz, now).date().toordinal()
+
+
+def day_start(tz=None, now=None, days=0):
+    """
+    Returns the local midnight that starts the day of a UTC time, or a later day, as naive
+    UTC time. Days are counted in local dates, so days with a DST transition are 23 or 25
+    hours long.
+
+    Args:
+        tz (str, optional): The name of the timezone.
+        now (datetime, optional): The naive UTC time, defaults to the current time.
+        days (int, optional): The number of days to move forward.
+
+    Returns:
+        datetime: The naive UTC time of the local midnight.
+    """
+    date = local_now(tz, now).date() + td(days=days)
+    midnight = timezone(tz).localize(dt(date.year, date.month, date.day))
+
+    return midnight.astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def utc_offset(tz=None, now=None):
+    """
+    Returns the offset of a timezone from UTC at a point in time.
+
+    Args:
+        tz (str, optional): The name of the timezone.
+        now (datetime, optional): The naive UTC time, defaults to the current time.
+
+    Returns:
+        int: The offset in minutes, e.g. 60 for CET and 120 for CEST.
+    """
+    return int(local_now(tz, now).utcoffset().total_seconds() // 60)
+
+
+def utc_minutes(reminders, offset):
+    """
+    Converts local reminder times to minutes of the UTC day.
+
+    Args:
+        reminders (List[str]): The reminder times in the format 'HH:MM'.
+        offset (int): The offset of the local time from UTC in minutes.
+
+    Returns:
+        List[int]: The minute of the UTC day of every reminder.
+    """
+    minutes = []
+    for reminder in reminders:
+        hour, minute = reminder.split(":")
+        minutes.append(
+            (int(hour) * 60 + int(minute) - offset) % MINUTES_PER_DAY
+        )
+
+    return minutes